@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'amodgreen.settings')
 
 application = get_asgi_application()
+
+# 103 Early Hints pour les serveurs ASGI qui les prennent en charge
+from store.preload import EarlyHintsMiddleware  # noqa: E402
+
+application = EarlyHintsMiddleware(application)
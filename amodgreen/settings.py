@@ -31,6 +31,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'store.middlewares.CompressionMiddleware',
+    'store.middlewares.PreloadMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,8 +49,16 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Gabarits allégés (indentation, commentaires) une seule fois, avant la mise en cache
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    ('store.template_loaders.Loader', [
+                        'django.template.loaders.filesystem.Loader',
+                        'django.template.loaders.app_directories.Loader',
+                    ]),
+                ]),
+            ],
             'context_processors': [
                 'store.context_processors.cart_count',
                 'django.template.context_processors.debug',
@@ -80,6 +90,32 @@ DATABASES = {
     }
 }
 
+# Cache partagé entre workers (voir store.caching pour le niveau local) :
+# Redis si REDIS_URL est défini, mémoire locale si CACHE_BACKEND=locmem (tests),
+# fichiers sinon.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'amodgreen',
+        }
+    }
+elif os.getenv('CACHE_BACKEND') == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(BASE_DIR / 'var' / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -129,6 +165,15 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 os.makedirs(MEDIA_ROOT, exist_ok=True)
 
+# Fichier binaire du catalogue partagé entre workers (manage.py build_catalog_file)
+CATALOG_FILE = os.getenv('CATALOG_FILE', str(BASE_DIR / 'var' / 'catalog.bin'))
+
+# Pages publiques pré-rendues (manage.py prerender_pages), servies par nginx
+PRERENDER_ROOT = os.getenv('PRERENDER_ROOT', str(BASE_DIR / 'var' / 'pages'))
+
+# Proxy inverse à purger par clés de substitution (requête PURGE + en-tête Surrogate-Key)
+SURROGATE_PURGE_URL = os.getenv('SURROGATE_PURGE_URL', '')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,48 @@
+// ====== PAGES PRÉ-RENDUES ======
+// Page servie telle quelle par nginx (store/prerender.py) : compléter ce qui dépend du visiteur.
+(function () {
+    function readCookie(name) {
+        const match = document.cookie.match('(?:^|; )' + name + '=([^;]*)');
+        return match ? decodeURIComponent(match[1]) : null;
+    }
+
+    function randomToken() {
+        const chars = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789';
+        const values = new Uint32Array(32);
+        crypto.getRandomValues(values);
+        return Array.from(values, v => chars[v % chars.length]).join('');
+    }
+
+    // Jeton du cookie csrftoken, créé au besoin : la page n'est pas passée par Django
+    function csrfToken() {
+        let token = readCookie('csrftoken');
+        if (!token) {
+            token = randomToken();
+            document.cookie = 'csrftoken=' + token + '; path=/; SameSite=Lax'
+                + (location.protocol === 'https:' ? '; Secure' : '');
+        }
+        return token;
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        // Badge du panier : cookie posé par les vues du panier
+        const count = readCookie('cart_count');
+        const badge = document.getElementById('cart-count');
+        if (badge && count !== null) badge.textContent = count;
+
+        // Jeton CSRF : le jeton rendu est celui d'aucun visiteur, on utilise le cookie
+        const inputs = document.querySelectorAll('input[name="csrfmiddlewaretoken"]');
+        if (inputs.length) {
+            const token = csrfToken();
+            inputs.forEach(input => { input.value = token; });
+        }
+
+        // Vue produit : la page n'est pas passée par Django (POST protégé par CSRF)
+        const viewUrl = document.body.dataset.viewUrl;
+        if (viewUrl && navigator.sendBeacon) {
+            const data = new FormData();
+            data.append('csrfmiddlewaretoken', csrfToken());
+            navigator.sendBeacon(viewUrl, data);
+        }
+    });
+})();
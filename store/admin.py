@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
 from .models import CustomUser, Category, Product, ProductImage, ProductVariant, Order, CommunityPost
+from . import ratings
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -133,11 +134,11 @@ class CommunityPostAdmin(admin.ModelAdmin):
     actions = ['approve_posts', 'unapprove_posts']
 
     def approve_posts(self, request, queryset):
-        updated = queryset.update(is_approved=True)
+        updated = ratings.set_approval(queryset, True)
         self.message_user(request, f"{updated} post(s) approuvé(s).")
     approve_posts.short_description = "Approuver les posts sélectionnés"
 
     def unapprove_posts(self, request, queryset):
-        updated = queryset.update(is_approved=False)
+        updated = ratings.set_approval(queryset, False)
         self.message_user(request, f"{updated} post(s) désapprouvé(s).")
     unapprove_posts.short_description = "Désapprouver les posts sélectionnés"
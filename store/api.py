@@ -0,0 +1,176 @@
+"""Sérialisation JSON du catalogue pour l'API en lecture seule.
+
+Les produits sont lus avec ``values()`` (note moyenne jointe dans la
+même requête) et leurs variantes en une seconde requête groupée : aucun
+objet modèle n'est instancié. Pour un jeu de champs donné (``fields=``),
+la liste des colonnes et les fonctions de conversion sont calculées une
+seule fois, puis appliquées à chaque ligne.
+"""
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from django.utils.encoding import filepath_to_uri
+
+from .models import Category, Product, ProductVariant
+
+MAX_IDS = 500
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+
+def _text(value):
+    return value
+
+
+def _decimal(value):
+    return str(value) if value is not None else None
+
+
+def _datetime(value):
+    return value.isoformat() if value is not None else None
+
+
+def _rating(average, count):
+    return {'average': round(average, 2), 'count': count} if count else {'average': 0, 'count': 0}
+
+
+def _static(convert):
+    return lambda: convert
+
+
+def _url_converter():
+    """``reverse`` n'est appelé qu'une fois par sérialisation (la langue active fixe le préfixe)."""
+    template = reverse('product_detail', kwargs={'pk': URL_SENTINEL}).replace(str(URL_SENTINEL), '{}')
+    return template.format
+
+
+def _image_converter():
+    storage = Product._meta.get_field('image').storage
+    if isinstance(storage, FileSystemStorage):
+        base_url = storage.base_url
+        return lambda name: base_url + filepath_to_uri(name).lstrip('/') if name else ''
+    return lambda name: storage.url(name) if name else ''
+
+
+URL_SENTINEL = 2147483647
+
+# champ public → (colonnes lues, fabrique du convertisseur, appelée une fois par sérialisation)
+PRODUCT_FIELDS = {
+    'id': (('id',), _static(_text)),
+    'name': (('name',), _static(_text)),
+    'name_ar': (('name_ar',), _static(_text)),
+    'description': (('description',), _static(_text)),
+    'description_ar': (('description_ar',), _static(_text)),
+    'ingredients': (('ingredients',), _static(_text)),
+    'ingredients_ar': (('ingredients_ar',), _static(_text)),
+    'price': (('price',), _static(_decimal)),
+    'image': (('image',), _image_converter),
+    'category': (('category_id',), _static(_text)),
+    'is_available': (('is_available',), _static(_text)),
+    'default_variant': (('default_variant_id',), _static(_text)),
+    'created_at': (('created_at',), _static(_datetime)),
+    'updated_at': (('updated_at',), _static(_datetime)),
+    'url': (('id',), _url_converter),
+    'rating': (('rating_summary__average', 'rating_summary__count'), _static(_rating)),
+}
+# Champ calculé à part (seconde requête)
+VARIANTS_FIELD = 'variants'
+ALL_PRODUCT_FIELDS = tuple(PRODUCT_FIELDS) + (VARIANTS_FIELD,)
+
+VARIANT_COLUMNS = ('product_id', 'id', 'name', 'price', 'is_default')
+CATEGORY_COLUMNS = ('id', 'name', 'name_ar', 'description', 'updated_at')
+
+
+def parse_fields(raw):
+    """Champs demandés par ``fields=a,b,c`` ; ``ValueError`` si l'un est inconnu."""
+    if not raw:
+        return ALL_PRODUCT_FIELDS
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in ALL_PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError("Champ(s) inconnu(s) : " + ', '.join(unknown))
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return tuple(fields)
+
+
+def parse_ids(raw):
+    """IDs de ``ids=1,2,3`` dans l'ordre, sans doublons ; ``ValueError`` si invalides ou trop nombreux."""
+    ids = []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError(f"Identifiant invalide : {part}")
+        ids.append(int(part))
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_IDS:
+        raise ValueError(f"{MAX_IDS} identifiants au maximum.")
+    return ids
+
+
+def parse_limit(raw):
+    """Taille de page de ``limit=``, ramenée entre 1 et ``MAX_LIMIT`` ; ``ValueError`` si non entière."""
+    if raw is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("limit doit être un entier.") from None
+    return max(1, min(limit, MAX_LIMIT))
+
+
+class ProductSerializer:
+    """Sérialiseur de lignes ``values()`` pour un jeu de champs fixé."""
+
+    def __init__(self, fields=ALL_PRODUCT_FIELDS):
+        self.fields = fields
+        self.with_variants = VARIANTS_FIELD in fields
+        columns = {'id': None, 'created_at': None}
+        self.plan = []
+        for name in fields:
+            if name == VARIANTS_FIELD:
+                continue
+            sources, converter = PRODUCT_FIELDS[name]
+            columns.update(dict.fromkeys(sources))
+            self.plan.append((name, sources, converter))
+        self.columns = tuple(columns)
+
+    def rows(self, queryset):
+        return queryset.values(*self.columns)
+
+    def variants_for(self, product_ids):
+        variants = {}
+        rows = (
+            ProductVariant.objects.filter(product_id__in=product_ids)
+            .order_by('-is_default', 'name')
+            .values_list(*VARIANT_COLUMNS)
+        )
+        for product_id, pk, name, price, is_default in rows:
+            variants.setdefault(product_id, []).append(
+                {'id': pk, 'name': name, 'price': str(price), 'is_default': is_default}
+            )
+        return variants
+
+    def serialize(self, rows):
+        rows = list(rows)
+        variants = self.variants_for([row['id'] for row in rows]) if self.with_variants else None
+        plan = [(name, sources, converter()) for name, sources, converter in self.plan]
+        results = []
+        for row in rows:
+            item = {}
+            for name, sources, convert in plan:
+                item[name] = convert(*[row[source] for source in sources])
+            if variants is not None:
+                item[VARIANTS_FIELD] = variants.get(row['id'], [])
+            results.append(item)
+        return results
+
+
+def serialize_categories(queryset=None):
+    queryset = Category.objects.all() if queryset is None else queryset
+    return [
+        {'id': pk, 'name': name, 'name_ar': name_ar, 'description': description,
+         'updated_at': _datetime(updated_at)}
+        for pk, name, name_ar, description, updated_at in queryset.values_list(*CATEGORY_COLUMNS)
+    ]
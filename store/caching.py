@@ -0,0 +1,295 @@
+"""Cache à deux niveaux : LRU en mémoire du worker devant le cache partagé.
+
+* Niveau 1 : ``LocalLRU``, borné à ``LOCAL_MAX_ENTRIES`` entrées et
+  ``LOCAL_TTL`` secondes, pour éviter un aller-retour vers le cache partagé
+  sur les clés lues à chaque requête.
+* Niveau 2 : ``settings.CACHES['default']`` (Redis, fichiers, ou mémoire
+  locale en test), commun à tous les workers.
+
+Les clés sont versionnées par espace de noms : ``bump('facets')`` rend
+toutes les clés de l'espace obsolètes sans les parcourir. Les durées de
+vie reçoivent une variation aléatoire (``TTL_JITTER``) pour que des clés
+écrites ensemble n'expirent pas ensemble.
+
+``get_or_set`` garde la valeur périmée pendant ``stale_ttl`` secondes
+supplémentaires et ne laisse qu'un seul worker la recalculer (verrou
+``add`` dans le cache partagé) : les autres servent la valeur périmée, ou
+attendent brièvement le résultat si la clé est absente.
+
+Le verrou et ``bump`` (``incr``) supposent un cache partagé où ``add`` et
+``incr`` sont atomiques (Redis, Memcached, mémoire locale). Ce n'est pas le
+cas de ``FileBasedCache`` (lecture puis écriture du fichier), le cache par
+défaut sans ``REDIS_URL`` : ``atomic_backend`` le détecte. Sur ce cache, le
+verrou est un fichier ``<LOCATION>/locks/<sha1>.lock`` créé avec
+``O_CREAT | O_EXCL`` (ignoré par le nettoyage de ``MAX_ENTRIES``, qui ne
+voit que les ``.djcache``), et ``bump`` écrit une version aléatoire au lieu
+d'incrémenter (deux ``bump`` simultanés donnent bien deux versions
+différentes).
+
+Une version d'espace de noms absente du cache partagé (expulsée par
+``MAX_ENTRIES``, ou cache vidé) est réinitialisée à une valeur aléatoire,
+jamais à une constante : les anciennes entrées de l'espace ne redeviennent
+pas visibles.
+"""
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+LOCAL_MAX_ENTRIES = 1024
+LOCAL_TTL = 5
+VERSION_TTL = 2
+TTL_JITTER = 0.1
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 2.0
+WAIT_STEP = 0.05
+
+MISSING = object()
+
+
+def atomic_backend(backend):
+    """``True`` si ``add`` et ``incr`` de ``backend`` sont atomiques entre workers."""
+    return not isinstance(backend, FileBasedCache)
+
+
+class LocalLRU:
+    """Dictionnaire LRU borné, avec expiration, sûr entre threads."""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def new_version():
+    """Version aléatoire, pour qu'une version perdue ne retombe jamais sur une ancienne."""
+    return random.getrandbits(62)
+
+
+class FileLock:
+    """Verrou inter-processus : fichier créé avec ``O_CREAT | O_EXCL``.
+
+    Un fichier plus vieux que ``timeout`` secondes (worker tué pendant le
+    calcul) est considéré comme abandonné et remplacé.
+    """
+
+    def __init__(self, directory, key, timeout=LOCK_TIMEOUT):
+        name = hashlib.sha1(key.encode()).hexdigest()
+        self.path = os.path.join(directory, 'locks', f'{name}.lock')
+        self.timeout = timeout
+
+    def acquire(self):
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                continue
+            except FileExistsError:
+                try:
+                    age = time.time() - os.path.getmtime(self.path)
+                except FileNotFoundError:
+                    continue
+                if age < self.timeout:
+                    return False
+                self.release()
+                continue
+            os.close(fd)
+            return True
+        return False
+
+    def release(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def jittered(ttl):
+    if ttl is None:
+        return None
+    return ttl * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)
+
+
+class TieredCache:
+    def __init__(self, alias='default', local_ttl=LOCAL_TTL, max_entries=LOCAL_MAX_ENTRIES):
+        self.alias = alias
+        self.local_ttl = local_ttl
+        self.local = LocalLRU(max_entries)
+        self.counters = Counter()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    # -------------------- versions --------------------
+    def version(self, namespace):
+        key = f'ns:{namespace}'
+        now = time.time()
+        version = self.local.get(key, now)
+        if version is MISSING:
+            version = self.shared.get_or_set(key, new_version, None)
+            self.local.set(key, version, now + VERSION_TTL)
+        return version
+
+    def bump(self, namespace):
+        """Invalide toutes les clés de ``namespace``."""
+        key = f'ns:{namespace}'
+        if not atomic_backend(self.shared):
+            version = new_version()
+            self.shared.set(key, version, None)
+            self.local.set(key, version, time.time() + VERSION_TTL)
+            return version
+        try:
+            version = self.shared.incr(key)
+        except ValueError:
+            version = new_version()
+            self.shared.set(key, version, None)
+        self.local.set(key, version, time.time() + VERSION_TTL)
+        return version
+
+    def make_key(self, key, namespace=None):
+        if namespace is None:
+            return key
+        return f'{namespace}:{self.version(namespace)}:{key}'
+
+    # -------------------- lecture / écriture --------------------
+    def _read(self, full_key, now):
+        """Enveloppe ``(frais_jusqu_a, valeur)`` depuis le niveau 1 puis le niveau 2."""
+        entry = self.local.get(full_key, now)
+        if entry is not MISSING:
+            self.counters['local_hits'] += 1
+            return entry
+        entry = self.shared.get(full_key, MISSING)
+        if entry is MISSING:
+            return MISSING
+        self.counters['shared_hits'] += 1
+        self._remember(full_key, entry, now)
+        return entry
+
+    def _remember(self, full_key, entry, now):
+        fresh_until = entry[0]
+        self.local.set(full_key, entry, min(fresh_until, now + self.local_ttl) if fresh_until > now else now + 1)
+
+    def _write(self, full_key, value, ttl, stale_ttl):
+        now = time.time()
+        ttl = jittered(ttl)
+        fresh_until = math.inf if ttl is None else now + ttl
+        timeout = None if ttl is None else ttl + (stale_ttl or 0)
+        entry = (fresh_until, value)
+        self.shared.set(full_key, entry, timeout)
+        self._remember(full_key, entry, now)
+
+    def get(self, key, default=None, namespace=None):
+        entry = self._read(self.make_key(key, namespace), time.time())
+        if entry is MISSING:
+            self.counters['misses'] += 1
+            return default
+        return entry[1]
+
+    def set(self, key, value, ttl, namespace=None, stale_ttl=0):
+        self._write(self.make_key(key, namespace), value, ttl, stale_ttl)
+
+    def delete(self, key, namespace=None):
+        full_key = self.make_key(key, namespace)
+        self.local.delete(full_key)
+        self.shared.delete(full_key)
+
+    # -------------------- verrou --------------------
+    def _acquire(self, lock_key):
+        """Verrou commun à tous les workers, ou ``None`` s'il est déjà pris."""
+        if atomic_backend(self.shared):
+            if self.shared.add(lock_key, 1, LOCK_TIMEOUT):
+                return lambda: self.shared.delete(lock_key)
+            return None
+        lock = FileLock(settings.CACHES[self.alias]['LOCATION'], lock_key)
+        if lock.acquire():
+            return lock.release
+        return None
+
+    def get_or_set(self, key, compute, ttl, namespace=None, stale_ttl=None):
+        """Valeur en cache, ou ``compute()`` par un seul worker à la fois.
+
+        ``stale_ttl`` (par défaut ``ttl``) : durée pendant laquelle une valeur
+        périmée peut encore être servie pendant son recalcul.
+        """
+        full_key = self.make_key(key, namespace)
+        stale_ttl = ttl if stale_ttl is None else stale_ttl
+        now = time.time()
+        entry = self._read(full_key, now)
+        if entry is not MISSING and entry[0] > now:
+            return entry[1]
+
+        release = self._acquire(f'{full_key}:lock')
+        if release is not None:
+            self.counters['misses' if entry is MISSING else 'refreshes'] += 1
+            try:
+                value = compute()
+                self._write(full_key, value, ttl, stale_ttl)
+            finally:
+                release()
+            return value
+
+        if entry is not MISSING:
+            self.counters['stale_hits'] += 1
+            return entry[1]
+
+        # Un autre worker calcule déjà la valeur : l'attendre un peu
+        deadline = now + WAIT_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(WAIT_STEP)
+            entry = self.shared.get(full_key, MISSING)
+            if entry is not MISSING:
+                self.counters['waits'] += 1
+                self._remember(full_key, entry, time.time())
+                return entry[1]
+        self.counters['misses'] += 1
+        value = compute()
+        self._write(full_key, value, ttl, stale_ttl)
+        return value
+
+    # -------------------- statistiques --------------------
+    def stats(self):
+        """Compteurs du worker courant et taux de succès."""
+        counters = dict(self.counters)
+        hits = sum(counters.get(name, 0) for name in ('local_hits', 'shared_hits', 'stale_hits', 'waits'))
+        lookups = hits + counters.get('misses', 0) + counters.get('refreshes', 0)
+        counters['hit_rate'] = round(100 * hits / lookups, 1) if lookups else None
+        return counters
+
+
+tiered = TieredCache()
@@ -0,0 +1,72 @@
+"""Prix du panier, calculés une fois à partir d'une seule requête.
+
+``price_cart(cart)`` lit les lignes avec leur variante et leur produit
+(``select_related('variant__product')`` pour un ``Cart``, la requête du
+cookie pour un ``CookieCart``) et calcule le total de chaque ligne, le
+nombre d'articles et le total général. Les gabarits du panier, du
+récapitulatif et du formulaire de commande n'interrogent plus la base.
+
+Chaque ligne garde le prix vu par le visiteur (à l'ajout, puis à chaque
+affichage) : une ligne dont la variante a changé de prix depuis est listée
+dans ``changed_lines``. ``acknowledge()`` retient ensuite les prix actuels,
+pour que le changement ne soit signalé qu'une fois.
+"""
+from decimal import Decimal
+
+from .cookie_cart import CookieCart
+from .models import CartItem
+
+
+class PricedLine:
+    __slots__ = ('id', 'variant', 'product', 'quantity', 'price', 'added_price', 'total')
+
+    def __init__(self, line_id, variant, quantity, added_price):
+        self.id = line_id
+        self.variant = variant
+        self.product = variant.product
+        self.quantity = quantity
+        self.price = variant.price
+        self.added_price = added_price
+        self.total = variant.price * quantity
+
+    @property
+    def price_changed(self):
+        return self.added_price is not None and self.added_price != self.price
+
+
+class CartPricing:
+    def __init__(self, cart, lines):
+        self.cart = cart
+        self.lines = tuple(lines)
+        self.item_count = sum(line.quantity for line in self.lines)
+        self.total = sum((line.total for line in self.lines), Decimal('0'))
+        self.changed_lines = tuple(line for line in self.lines if line.price_changed)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def acknowledge(self):
+        """Retient les prix actuels des lignes modifiées (cookie réécrit par ``CookieCart.save``)."""
+        if isinstance(self.cart, CookieCart):
+            for line in self.changed_lines:
+                self.cart.remember_price(line.variant.id, line.price)
+            return
+        for line in self.changed_lines:
+            CartItem.objects.filter(pk=line.id).update(unit_price=line.price)
+
+
+def price_cart(cart):
+    """``CartPricing`` de ``cart`` (``None`` : panier vide)."""
+    if cart is None:
+        return CartPricing(None, ())
+    if isinstance(cart, CookieCart):
+        return CartPricing(cart, (
+            PricedLine(line.id, line.variant, line.quantity, line.unit_price) for line in cart.items
+        ))
+    items = CartItem.objects.filter(cart=cart).select_related('variant__product').order_by('id')
+    return CartPricing(cart, (
+        PricedLine(item.id, item.variant, item.quantity, item.unit_price) for item in items
+    ))
@@ -0,0 +1,273 @@
+"""Instantané immuable du catalogue, partagé par toutes les requêtes d'un worker.
+
+Catégories, produits disponibles (avec leurs agrégats de notes), variantes
+et images sont chargés une fois (quatre requêtes) dans des objets compacts à
+``__slots__``. L'instantané est
+remplacé d'un bloc lorsque ``CatalogVersion.generation`` change ; la
+génération n'est relue en base qu'une fois toutes les
+``CATALOG_CHECK_INTERVAL`` secondes.
+
+Si ``settings.CATALOG_FILE`` contient la génération courante (voir
+``catalog_file``), le catalogue est lu dans ce fichier projeté en mémoire,
+partagé entre workers, au lieu d'être copié dans chaque processus.
+"""
+import threading
+import time
+
+from django.db import transaction
+from django.urls import reverse
+from django.utils.translation import get_language
+
+from .caching import tiered
+from .models import CatalogVersion, Category, Product, ProductImage, ProductVariant
+
+CATALOG_CHECK_INTERVAL = 5
+GENERATION_KEY = 'catalog:generation'
+URL_SENTINEL = 2147483647
+
+_url_templates = {}
+
+
+class EntryList(tuple):
+    """Tuple exposant le sous-ensemble de l'API QuerySet utilisé par les gabarits."""
+
+    def all(self):
+        return self
+
+    def first(self):
+        return self[0] if self else None
+
+    def exists(self):
+        return bool(self)
+
+    def count(self):
+        return len(self)
+
+
+class ImageEntry:
+    __slots__ = ('name', 'url')
+
+    def __init__(self, field):
+        self.name = field.name
+        self.url = field.url if field else ''
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __str__(self):
+        return self.name
+
+
+class CategoryEntry:
+    __slots__ = ('id', 'pk', 'name', 'name_ar', 'description')
+
+    def __init__(self, category):
+        self.id = self.pk = category.id
+        self.name = category.name
+        self.name_ar = category.name_ar
+        self.description = category.description
+
+    def __str__(self):
+        return self.name
+
+
+class VariantEntry:
+    __slots__ = ('id', 'pk', 'product_id', 'name', 'price', 'is_default')
+
+    def __init__(self, variant):
+        self.id = self.pk = variant.id
+        self.product_id = variant.product_id
+        self.name = variant.name
+        self.price = variant.price
+        self.is_default = variant.is_default
+
+    def __str__(self):
+        return f"{self.name} ({self.price} MAD)"
+
+
+class AdditionalImageEntry:
+    __slots__ = ('id', 'image')
+
+    def __init__(self, product_image):
+        self.id = product_image.id
+        self.image = ImageEntry(product_image.image)
+
+
+class ProductEntry:
+    __slots__ = (
+        'id', 'pk', 'name', 'name_ar', 'description', 'description_ar',
+        'ingredients', 'ingredients_ar', 'price', 'image', 'category', 'category_id',
+        'created_at', 'updated_at', 'default_variant', 'default_variant_id',
+        'variants', 'additional_images', 'rating_average', 'rating_count',
+    )
+
+    def __init__(self, product, category, variants, images):
+        self.id = self.pk = product.id
+        self.name = product.name
+        self.name_ar = product.name_ar
+        self.description = product.description
+        self.description_ar = product.description_ar
+        self.ingredients = product.ingredients
+        self.ingredients_ar = product.ingredients_ar
+        self.price = product.price
+        self.image = ImageEntry(product.image)
+        self.category = category
+        self.category_id = product.category_id
+        self.created_at = product.created_at
+        self.updated_at = product.updated_at
+        self.variants = EntryList(variants)
+        self.additional_images = EntryList(images)
+        self.default_variant_id = product.default_variant_id
+        self.default_variant = next(
+            (v for v in variants if v.id == product.default_variant_id), None
+        )
+        summary = product.get_rating_summary()
+        self.rating_average = summary.average if summary else 0.0
+        self.rating_count = summary.count if summary else 0
+
+    @staticmethod
+    def url_for(pk):
+        """URL de la fiche dans la langue active ; ``reverse`` n'est appelé qu'une fois par langue."""
+        language = get_language()
+        template = _url_templates.get(language)
+        if template is None:
+            template = reverse('product_detail', kwargs={'pk': URL_SENTINEL}).replace(str(URL_SENTINEL), '{}')
+            _url_templates[language] = template
+        return template.format(pk)
+
+    @property
+    def url(self):
+        return self.url_for(self.id)
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return self.url_for(self.id)
+
+    def get_default_variant_price(self):
+        return self.default_variant.price if self.default_variant else self.price
+
+    def available_variants(self):
+        return self.variants
+
+    def average_rating(self):
+        return round(self.rating_average, 1) if self.rating_count else 0
+
+    def review_count(self):
+        """Nombre d'avis approuvés portant une note."""
+        return self.rating_count
+
+
+class CatalogSnapshot:
+    """Catalogue en lecture seule ; ne jamais modifier un instantané publié."""
+
+    __slots__ = ('generation', 'categories', 'products', 'product_list', 'by_category')
+    is_mapped = False
+
+    def __init__(self, generation):
+        self.generation = generation
+
+        categories = {c.id: CategoryEntry(c) for c in Category.objects.all()}
+
+        variants = {}
+        for variant in ProductVariant.objects.filter(product__is_available=True):
+            variants.setdefault(variant.product_id, []).append(VariantEntry(variant))
+
+        images = {}
+        for image in ProductImage.objects.filter(product__is_available=True):
+            images.setdefault(image.product_id, []).append(AdditionalImageEntry(image))
+
+        products = [
+            ProductEntry(
+                product, categories.get(product.category_id),
+                variants.get(product.id, ()), images.get(product.id, ()),
+            )
+            for product in Product.objects.filter(is_available=True)
+            .select_related('rating_summary').order_by('-created_at', '-id')
+        ]
+
+        by_category = {}
+        for product in products:
+            by_category.setdefault(product.category_id, []).append(product)
+
+        self.categories = EntryList(sorted(categories.values(), key=lambda c: c.name))
+        self.products = {product.id: product for product in products}
+        self.product_list = EntryList(products)
+        self.by_category = {pk: EntryList(items) for pk, items in by_category.items()}
+
+    def get_product(self, pk):
+        return self.products.get(pk)
+
+    def resolve(self, ids):
+        """Produits de l'instantané pour ``ids``, dans le même ordre."""
+        products = self.products
+        return [products[pk] for pk in ids if pk in products]
+
+    def related(self, product, limit=4):
+        return [p for p in self.by_category.get(product.category_id, ()) if p.id != product.id][:limit]
+
+
+def _load(generation):
+    """Projette le fichier partagé s'il est à jour, sinon construit l'instantané en mémoire.
+
+    Un fichier à la bonne génération mais illisible (corrompu, tronqué) est
+    retenu dans ``_unmappable`` : il n'est plus retenté avant la génération
+    suivante.
+    """
+    global _unmappable
+    from .catalog_file import open_catalog
+    mapped = open_catalog(generation)
+    if mapped is not None:
+        return mapped
+    if _file_ready(generation):
+        _unmappable = generation
+    return CatalogSnapshot(generation)
+
+
+def _file_ready(generation):
+    from .catalog_file import read_generation
+    return read_generation() == generation
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = None
+_unmappable = None
+
+
+def get_catalog():
+    """Instantané courant du worker, reconstruit si la génération a changé."""
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and _checked_at is not None and now - _checked_at < CATALOG_CHECK_INTERVAL:
+        return snapshot
+
+    # Lue en base par un seul worker par intervalle, les autres passent par le cache
+    generation = tiered.get_or_set(GENERATION_KEY, CatalogVersion.current, CATALOG_CHECK_INTERVAL, stale_ttl=0)
+    # Un instantané en mémoire est remplacé dès que le fichier partagé rattrape la génération
+    if snapshot is None or snapshot.generation != generation or (
+        not snapshot.is_mapped and _unmappable != generation and _file_ready(generation)
+    ):
+        with _lock:
+            if _snapshot is None or _snapshot.generation != generation or (
+                not _snapshot.is_mapped and _unmappable != generation
+            ):
+                _snapshot = _load(generation)
+            snapshot = _snapshot
+    _checked_at = now
+    return snapshot
+
+
+def _bump():
+    global _checked_at
+    CatalogVersion.bump()
+    tiered.delete(GENERATION_KEY)
+    # Forcer la relecture de la génération à la prochaine requête de ce worker
+    _checked_at = None
+
+
+def invalidate():
+    """Incrémente la génération une fois la transaction courante validée."""
+    transaction.on_commit(_bump)
@@ -0,0 +1,345 @@
+"""Fichier binaire du catalogue, partagé entre workers via ``mmap``.
+
+``manage.py build_catalog_file`` sérialise les catégories, les produits
+disponibles (avec leurs agrégats de notes), leurs variantes et leurs images dans un fichier à
+enregistrements de taille fixe :
+
+    en-tête | catégories | produits | variantes | images
+            | index id → produit | index catégorie → produits | chaînes
+
+Les chaînes sont stockées une seule fois dans une table en fin de fichier et
+référencées par ``(offset, longueur)``. Chaque worker projette le fichier en
+lecture seule : les pages sont partagées par le cache du noyau, donc la
+mémoire ne grandit pas avec le nombre de workers. Le fichier est remplacé
+par un ``os.replace`` atomique et les workers le reprojettent à la
+génération suivante.
+"""
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+
+from .catalog import AdditionalImageEntry, CategoryEntry, EntryList, ImageEntry, ProductEntry, VariantEntry
+
+MAGIC = b'AMGC'
+FORMAT_VERSION = 2
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# magic, version, génération, nombres d'enregistrements, offsets des sections
+HEADER = struct.Struct('<4sHQ6I7Q')
+STR = 'II'
+CATEGORY = struct.Struct('<Q' + STR * 3)
+PRODUCT = struct.Struct('<QQqqqQIIIIdI' + STR * 8)
+VARIANT = struct.Struct('<QQqB' + STR)
+IMAGE = struct.Struct('<Q' + STR * 2)
+ID_INDEX = struct.Struct('<QI')
+CATEGORY_INDEX = struct.Struct('<QII')
+U32 = struct.Struct('<I')
+
+SECTIONS = ('categories', 'products', 'variants', 'images', 'id_index', 'category_index', 'strings')
+
+
+def catalog_path():
+    return str(settings.CATALOG_FILE)
+
+
+def _cents(value):
+    return int((Decimal(value) * 100).to_integral_value())
+
+
+def _micros(value):
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+class _StringTable:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = {}
+
+    def add(self, text):
+        data = (text or '').encode('utf-8')
+        ref = self.offsets.get(data)
+        if ref is None:
+            ref = (len(self.buffer), len(data))
+            self.offsets[data] = ref
+            self.buffer += data
+        return ref
+
+
+def write_catalog_file(generation, path=None):
+    """Sérialise le catalogue disponible et remplace ``path`` atomiquement."""
+    from .models import Category, Product, ProductImage, ProductVariant
+
+    path = path or catalog_path()
+    strings = _StringTable()
+
+    categories = list(Category.objects.order_by('name'))
+    products = list(
+        Product.objects.filter(is_available=True).select_related('rating_summary').order_by('-created_at', '-id')
+    )
+    variants = {}
+    for variant in ProductVariant.objects.filter(product__is_available=True).order_by('-is_default', 'name'):
+        variants.setdefault(variant.product_id, []).append(variant)
+    images = {}
+    for image in ProductImage.objects.filter(product__is_available=True).order_by('uploaded_at'):
+        images.setdefault(image.product_id, []).append(image)
+
+    category_bytes = bytearray()
+    for category in categories:
+        category_bytes += CATEGORY.pack(
+            category.id,
+            *strings.add(category.name), *strings.add(category.name_ar), *strings.add(category.description),
+        )
+
+    product_bytes, variant_bytes, image_bytes = bytearray(), bytearray(), bytearray()
+    n_variants = n_images = 0
+    by_category = {}
+    for index, product in enumerate(products):
+        product_variants = variants.get(product.id, [])
+        product_images = images.get(product.id, [])
+        summary = product.get_rating_summary()
+        product_bytes += PRODUCT.pack(
+            product.id, product.category_id, _cents(product.price),
+            _micros(product.created_at), _micros(product.updated_at),
+            product.default_variant_id or 0,
+            n_variants, len(product_variants), n_images, len(product_images),
+            summary.average if summary else 0.0, summary.count if summary else 0,
+            *strings.add(product.name), *strings.add(product.name_ar),
+            *strings.add(product.description), *strings.add(product.description_ar),
+            *strings.add(product.ingredients), *strings.add(product.ingredients_ar),
+            *strings.add(product.image.name), *strings.add(product.image.url if product.image else ''),
+        )
+        for variant in product_variants:
+            variant_bytes += VARIANT.pack(
+                variant.id, variant.product_id, _cents(variant.price), variant.is_default,
+                *strings.add(variant.name),
+            )
+        for image in product_images:
+            image_bytes += IMAGE.pack(
+                image.id, *strings.add(image.image.name), *strings.add(image.image.url if image.image else ''),
+            )
+        n_variants += len(product_variants)
+        n_images += len(product_images)
+        by_category.setdefault(product.category_id, []).append(index)
+
+    id_index = b''.join(
+        ID_INDEX.pack(pk, index) for pk, index in sorted((p.id, i) for i, p in enumerate(products))
+    )
+    category_index, members = bytearray(), bytearray()
+    for category_id in sorted(by_category):
+        indices = by_category[category_id]
+        category_index += CATEGORY_INDEX.pack(category_id, len(members) // U32.size, len(indices))
+        for index in indices:
+            members += U32.pack(index)
+    category_index_section = bytes(category_index) + bytes(members)
+
+    sections = [category_bytes, product_bytes, variant_bytes, image_bytes, id_index,
+                category_index_section, strings.buffer]
+    offsets, position = [], HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, generation,
+        len(categories), len(products), n_variants, n_images, len(id_index) // ID_INDEX.size,
+        len(by_category), *offsets,
+    )
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(header)
+            for section in sections:
+                handle.write(section)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(products)
+
+
+def read_generation(path=None):
+    """Génération inscrite dans l'en-tête du fichier, ou None s'il est absent/invalide."""
+    try:
+        with open(path or catalog_path(), 'rb') as handle:
+            data = handle.read(HEADER.size)
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, generation, *_ = HEADER.unpack(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    return generation
+
+
+class MappedCatalog:
+    """Catalogue lu directement dans le fichier projeté ; même API que ``CatalogSnapshot``."""
+
+    is_mapped = True
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.generation, self._n_categories, self._n_products,
+         _, _, self._n_ids, self._n_category_index, *offsets) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Fichier catalogue invalide")
+        self._offsets = dict(zip(SECTIONS, offsets))
+
+        self.categories = EntryList(self._category(i) for i in range(self._n_categories))
+        self._categories_by_id = {category.id: category for category in self.categories}
+        self.product_list = MappedProductList(self)
+
+    # -------------------- décodage --------------------
+    def _str(self, offset, length):
+        start = self._offsets['strings'] + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def _category(self, index):
+        values = CATEGORY.unpack_from(self._map, self._offsets['categories'] + index * CATEGORY.size)
+        entry = CategoryEntry.__new__(CategoryEntry)
+        entry.id = entry.pk = values[0]
+        entry.name, entry.name_ar, entry.description = (
+            self._str(*values[i:i + 2]) for i in range(1, 7, 2)
+        )
+        return entry
+
+    def _variant(self, index):
+        pk, product_id, cents, is_default, *name = VARIANT.unpack_from(
+            self._map, self._offsets['variants'] + index * VARIANT.size
+        )
+        entry = VariantEntry.__new__(VariantEntry)
+        entry.id = entry.pk = pk
+        entry.product_id = product_id
+        entry.price = Decimal(cents).scaleb(-2)
+        entry.is_default = bool(is_default)
+        entry.name = self._str(*name)
+        return entry
+
+    def _image(self, index):
+        pk, *refs = IMAGE.unpack_from(self._map, self._offsets['images'] + index * IMAGE.size)
+        entry = AdditionalImageEntry.__new__(AdditionalImageEntry)
+        entry.id = pk
+        entry.image = ImageEntry.__new__(ImageEntry)
+        entry.image.name, entry.image.url = self._str(*refs[0:2]), self._str(*refs[2:4])
+        return entry
+
+    def product_at(self, index):
+        values = PRODUCT.unpack_from(self._map, self._offsets['products'] + index * PRODUCT.size)
+        (pk, category_id, cents, created, updated, default_variant_id,
+         first_variant, n_variants, first_image, n_images, rating_average, rating_count) = values[:12]
+        texts = [self._str(*values[i:i + 2]) for i in range(12, 28, 2)]
+
+        entry = ProductEntry.__new__(ProductEntry)
+        entry.id = entry.pk = pk
+        (entry.name, entry.name_ar, entry.description, entry.description_ar,
+         entry.ingredients, entry.ingredients_ar) = texts[:6]
+        entry.price = Decimal(cents).scaleb(-2)
+        entry.image = ImageEntry.__new__(ImageEntry)
+        entry.image.name, entry.image.url = texts[6], texts[7]
+        entry.category_id = category_id
+        entry.category = self._categories_by_id.get(category_id)
+        entry.created_at = EPOCH + timedelta(microseconds=created)
+        entry.updated_at = EPOCH + timedelta(microseconds=updated)
+        entry.variants = EntryList(self._variant(first_variant + i) for i in range(n_variants))
+        entry.additional_images = EntryList(self._image(first_image + i) for i in range(n_images))
+        entry.default_variant_id = default_variant_id or None
+        entry.default_variant = next((v for v in entry.variants if v.id == default_variant_id), None)
+        entry.rating_average = rating_average
+        entry.rating_count = rating_count
+        return entry
+
+    # -------------------- API de CatalogSnapshot --------------------
+    def _record_index(self, pk):
+        base = self._offsets['id_index']
+        low, high = 0, self._n_ids
+        while low < high:
+            middle = (low + high) // 2
+            found, index = ID_INDEX.unpack_from(self._map, base + middle * ID_INDEX.size)
+            if found == pk:
+                return index
+            if found < pk:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def get_product(self, pk):
+        index = self._record_index(pk)
+        return self.product_at(index) if index is not None else None
+
+    def resolve(self, ids):
+        products = (self.get_product(pk) for pk in ids)
+        return [product for product in products if product is not None]
+
+    def _category_members(self, category_id):
+        base = self._offsets['category_index']
+        entries = [
+            CATEGORY_INDEX.unpack_from(self._map, base + i * CATEGORY_INDEX.size)
+            for i in range(self._n_category_index)
+        ]
+        position = bisect_left(entries, (category_id,))
+        if position == len(entries) or entries[position][0] != category_id:
+            return []
+        _, start, count = entries[position]
+        members = base + self._n_category_index * CATEGORY_INDEX.size
+        return [U32.unpack_from(self._map, members + (start + i) * U32.size)[0] for i in range(count)]
+
+    def related(self, product, limit=4):
+        related = []
+        for index in self._category_members(product.category_id):
+            candidate = self.product_at(index)
+            if candidate.id != product.id:
+                related.append(candidate)
+                if len(related) == limit:
+                    break
+        return related
+
+
+class MappedProductList:
+    """Séquence paresseuse des produits du fichier, du plus récent au plus ancien."""
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __len__(self):
+        return self._catalog._n_products
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._catalog.product_at(i) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self._catalog.product_at(item)
+
+    def __iter__(self):
+        return (self._catalog.product_at(i) for i in range(len(self)))
+
+    def __bool__(self):
+        return len(self) > 0
+
+
+def open_catalog(generation, path=None):
+    """Projette le fichier s'il correspond à ``generation``, sinon None."""
+    path = path or catalog_path()
+    if read_generation(path) != generation:
+        return None
+    try:
+        return MappedCatalog(path)
+    except (OSError, ValueError, struct.error):
+        return None
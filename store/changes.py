@@ -0,0 +1,114 @@
+"""Flux de changements du catalogue (catégories, produits, variantes).
+
+Un client garde le curseur renvoyé par la dernière synchronisation et ne
+reçoit ensuite que les lignes dont ``updated_at`` est postérieur, plus les
+suppressions enregistrées dans ``CatalogTombstone``. Sans curseur, tout le
+catalogue est envoyé.
+
+Le curseur suivant recule de ``CURSOR_OVERLAP`` pour ne pas manquer une
+transaction validée pendant l'envoi : quelques lignes peuvent être
+renvoyées deux fois, ce qui est sans effet puisque chaque ligne est un
+remplacement complet.
+"""
+from datetime import datetime, timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CatalogTombstone, Category, Product, ProductVariant
+
+CURSOR_SALT = 'store.changes'
+CURSOR_OVERLAP = timedelta(seconds=60)
+TOMBSTONE_RETENTION = timedelta(days=90)
+CHUNK_SIZE = 500
+
+CATEGORY_FIELDS = ('id', 'name', 'name_ar', 'description', 'created_at', 'updated_at')
+PRODUCT_FIELDS = (
+    'id', 'name', 'name_ar', 'description', 'description_ar', 'ingredients', 'ingredients_ar',
+    'price', 'image', 'category_id', 'is_available', 'default_variant_id', 'created_at', 'updated_at',
+)
+VARIANT_FIELDS = ('id', 'product_id', 'name', 'price', 'is_default', 'created_at', 'updated_at')
+
+
+def encode_cursor(moment):
+    return signing.dumps(moment.isoformat(), salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    """Instant contenu dans ``cursor`` ; ``ValueError`` s'il est invalide."""
+    try:
+        return datetime.fromisoformat(signing.loads(cursor, salt=CURSOR_SALT))
+    except (signing.BadSignature, TypeError) as exc:
+        raise ValueError("Curseur invalide") from exc
+
+
+def needs_reset(since):
+    """Vrai si des suppressions postérieures à ``since`` ont pu être purgées."""
+    return since < timezone.now() - TOMBSTONE_RETENTION
+
+
+def purge_tombstones():
+    """Supprime les traces plus anciennes que ``TOMBSTONE_RETENTION``."""
+    deleted, _ = CatalogTombstone.objects.filter(
+        deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION
+    ).delete()
+    return deleted
+
+
+def _upserts(kind, queryset, fields, since, until, also=None):
+    """Lignes modifiées depuis ``since`` ; ``also`` : condition qui les renvoie aussi."""
+    if since is not None:
+        changed = Q(updated_at__gte=since)
+        queryset = queryset.filter(changed | also if also is not None else changed)
+    rows = queryset.filter(updated_at__lte=until).order_by('updated_at', 'id').values(*fields)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield {'type': kind, 'op': 'upsert', 'id': row['id'], 'data': row}
+
+
+def iter_changes(since=None, include_hidden=False):
+    """Lignes du flux depuis ``since`` ; la dernière porte le curseur suivant.
+
+    Sans ``include_hidden``, un produit indisponible (et ses variantes) est
+    annoncé comme supprimé, comme pour le catalogue public ; toutes ses
+    variantes sont renvoyées quand il redevient disponible.
+    """
+    until = timezone.now()
+    image_storage = Product._meta.get_field('image').storage
+
+    if since is not None and needs_reset(since):
+        # Le client doit vider sa copie locale : le catalogue complet suit
+        yield {'type': 'reset', 'reason': "Curseur trop ancien, synchronisation complète requise"}
+        since = None
+
+    yield from _upserts('category', Category.objects.all(), CATEGORY_FIELDS, since, until)
+
+    products = Product.objects.all()
+    variants = ProductVariant.objects.all()
+    variants_also = None
+    if not include_hidden:
+        if since is not None:
+            hidden = Product.objects.filter(is_available=False, updated_at__gte=since, updated_at__lte=until)
+            for pk in hidden.values_list('pk', flat=True).iterator(chunk_size=CHUNK_SIZE):
+                yield {'type': 'product', 'op': 'delete', 'id': pk}
+        products = products.filter(is_available=True)
+        variants = variants.filter(product__is_available=True)
+        # Produit modifié (peut-être de nouveau visible) : le client a pu effacer ses variantes
+        variants_also = Q(product__updated_at__gte=since)
+
+    for line in _upserts('product', products, PRODUCT_FIELDS, since, until):
+        image = line['data']['image']
+        line['data']['image'] = image_storage.url(image) if image else ''
+        yield line
+    yield from _upserts('variant', variants, VARIANT_FIELDS, since, until, also=variants_also)
+
+    if since is not None:
+        tombstones = (
+            CatalogTombstone.objects.filter(deleted_at__gte=since, deleted_at__lte=until)
+            .order_by('deleted_at', 'id')
+            .values_list('kind', 'object_id')
+        )
+        for kind, object_id in tombstones.iterator(chunk_size=CHUNK_SIZE):
+            yield {'type': kind, 'op': 'delete', 'id': object_id}
+
+    yield {'type': 'cursor', 'cursor': encode_cursor(until - CURSOR_OVERLAP), 'until': until}
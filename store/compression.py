@@ -0,0 +1,86 @@
+"""Compression des réponses (brotli si disponible, sinon gzip).
+
+``CompressionMiddleware`` choisit l'encodage d'après ``Accept-Encoding``,
+compresse les corps textuels d'un bloc et les réponses en flux morceau par
+morceau. Les types déjà compressés (images, PDF, classeurs…) et les
+petites réponses ne sont pas touchés.
+
+Une vue ou un cache peut fournir une version déjà compressée dans
+``response.precompressed = (encodage, octets)`` : ``page_cache`` y met la
+variante compressée une fois puis gardée en cache, pour ne pas
+recompresser la même page à chaque réponse.
+
+Le module ``brotli`` est optionnel : sans lui, seul gzip est proposé.
+"""
+import gzip
+import re
+import zlib
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle
+    brotli = None
+
+MIN_SIZE = 200
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+)
+# Niveaux par réponse (rapides) et pour les variantes mises en cache (compressées une fois)
+GZIP_LEVEL, GZIP_LEVEL_CACHED = 6, 9
+BROTLI_QUALITY, BROTLI_QUALITY_CACHED = 5, 11
+
+_accept = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(request):
+    """Meilleur encodage accepté par le client, ou ``None``."""
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        match = _accept.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(response):
+    if response.has_header('Content-Encoding') or response.status_code in (204, 206, 304):
+        return False
+    content_type = response.get('Content-Type', '').lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(data, encoding, cached=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY_CACHED if cached else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL_CACHED if cached else GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compresse un flux ; chaque morceau est vidé pour être envoyé sans attendre la suite."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,5 +1,12 @@
-from .utils import get_or_create_cart  
+from .page_cache import CART_COUNT_PLACEHOLDER
+from .utils import get_cart_count
 
 def cart_count(request):
-    cart = get_or_create_cart(request)
-    return {'cart_count': cart.items.count()}
\ No newline at end of file
+    # Page pré-rendue : ni session ni panier, le badge est rempli par js/prerender.js
+    if getattr(request, 'prerendered', False):
+        return {'cart_count': 0}
+    # Page mise en cache pour tous les anonymes : marqueur remplacé à chaque réponse
+    if getattr(request, 'page_cache', False):
+        return {'cart_count': CART_COUNT_PLACEHOLDER}
+    # Lecture seule : ni session ni panier créés pour afficher le badge
+    return {'cart_count': get_cart_count(request)}
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""Panier des visiteurs anonymes, gardé dans un cookie signé.
+
+Le cookie ``cart`` ne contient que les lignes
+``id_variante:quantité:prix_à_l'ajout`` séparées par ``|``, signées et
+horodatées (``set_signed_cookie``) : ni session ni ligne ``Cart``/``CartItem``
+en base, la consultation et la modification du panier ne font aucune
+écriture. Le prix gardé ne sert qu'à signaler un changement de prix (voir
+``cart_pricing``) : les prix facturés sont résolus en base, en une requête,
+à l'affichage ; ``order_create`` est la seule vue qui écrit (la commande et
+ses lignes).
+
+Les utilisateurs connectés gardent leur panier ``Cart`` en base. Un panier
+anonyme en base d'avant le cookie (clé de session) est repris dans le
+cookie à la visite suivante, puis supprimé quand le cookie est écrit ; ceux
+qui ne reviennent pas disparaissent avec leur session (voir ``signals``).
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core import signing
+
+from .catalog import EntryList
+from .models import Cart, CartItem, ProductVariant
+
+CART_COOKIE = 'cart'
+CART_COOKIE_SALT = 'store.cart'
+CART_COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+MAX_LINES = 50
+
+
+def decode(value):
+    """``({id_variante: quantité}, {id_variante: prix})`` ; les morceaux invalides sont ignorés."""
+    quantities, prices = {}, {}
+    for part in value.split('|')[:MAX_LINES] if value else ():
+        variant_id, _, rest = part.partition(':')
+        quantity, _, price = rest.partition(':')
+        try:
+            variant_id, quantity = int(variant_id), int(quantity)
+        except ValueError:
+            continue
+        if variant_id <= 0 or quantity <= 0:
+            continue
+        quantities[variant_id] = quantity
+        try:
+            prices[variant_id] = Decimal(price) if price else None
+        except InvalidOperation:
+            prices[variant_id] = None
+    return quantities, prices
+
+
+def encode(quantities, prices):
+    parts = []
+    for variant_id, quantity in quantities.items():
+        price = prices.get(variant_id)
+        parts.append(f'{variant_id}:{quantity}' if price is None else f'{variant_id}:{quantity}:{price}')
+    return '|'.join(parts)
+
+
+class CookieCartLine:
+    """Ligne résolue ; même API que ``CartItem`` (``unit_price`` : prix à l'ajout)."""
+
+    __slots__ = ('id', 'variant', 'quantity', 'unit_price')
+
+    def __init__(self, variant, quantity, unit_price):
+        # Identifiant de ligne passé à remove_from_cart : la variante
+        self.id = variant.id
+        self.variant = variant
+        self.quantity = quantity
+        self.unit_price = unit_price
+
+
+class CookieCart:
+    def __init__(self, quantities=None, prices=None):
+        self.quantities = dict(quantities or {})
+        self.prices = dict(prices or {})
+        self.modified = False
+        self._items = None
+        self.adopted_cart_ids = set()
+
+    @classmethod
+    def for_request(cls, request):
+        """Panier du cookie, lu une fois par requête."""
+        cart = getattr(request, '_cookie_cart', None)
+        if cart is None:
+            try:
+                value = request.get_signed_cookie(
+                    CART_COOKIE, default='', salt=CART_COOKIE_SALT, max_age=CART_COOKIE_MAX_AGE,
+                )
+            except signing.BadSignature:
+                value = ''
+            cart = request._cookie_cart = cls(*decode(value))
+            cart.adopt_session_cart(request)
+        return cart
+
+    def adopt_session_cart(self, request):
+        """Reprend les lignes d'un panier anonyme en base d'avant le cookie."""
+        session = getattr(request, 'session', None)
+        # Depuis le cookie, aucun visiteur anonyme n'a de session : requête rare
+        if session is None or not session.session_key:
+            return
+        rows = CartItem.objects.filter(
+            cart__session_key=session.session_key, cart__user__isnull=True,
+        ).values_list('cart_id', 'variant_id', 'quantity', 'unit_price')
+        for cart_id, variant_id, quantity, unit_price in rows:
+            self.adopted_cart_ids.add(cart_id)
+            if variant_id not in self.quantities and len(self.quantities) < MAX_LINES:
+                self.quantities[variant_id] = quantity
+                self.prices[variant_id] = unit_price
+                self._changed()
+
+    def _changed(self):
+        self.modified = True
+        self._items = None
+
+    def count(self):
+        return len(self.quantities)
+
+    def add(self, variant, quantity):
+        """Ajoute ``quantity`` au prix actuel ; ``False`` si le panier a déjà ``MAX_LINES`` lignes."""
+        if variant.id not in self.quantities and len(self.quantities) >= MAX_LINES:
+            return False
+        self.quantities[variant.id] = self.quantities.get(variant.id, 0) + quantity
+        self.prices[variant.id] = variant.price
+        self._changed()
+        return True
+
+    def remove(self, variant_id):
+        if self.quantities.pop(variant_id, None) is None:
+            return False
+        self.prices.pop(variant_id, None)
+        self._changed()
+        return True
+
+    def clear(self):
+        if self.quantities:
+            self.quantities.clear()
+            self.prices.clear()
+            self._changed()
+
+    def remember_price(self, variant_id, price):
+        """Prix vu par le visiteur, comparé aux prix suivants (voir ``cart_pricing``)."""
+        self.prices[variant_id] = price
+        self.modified = True
+
+    @property
+    def items(self):
+        """Lignes dans l'ordre d'ajout ; variantes supprimées ou indisponibles retirées."""
+        if self._items is None:
+            variants = (
+                ProductVariant.objects.select_related('product')
+                .filter(product__is_available=True)
+                .in_bulk(list(self.quantities))
+            ) if self.quantities else {}
+            lines = []
+            for variant_id, quantity in list(self.quantities.items()):
+                variant = variants.get(variant_id)
+                if variant is None:
+                    del self.quantities[variant_id]
+                    self.prices.pop(variant_id, None)
+                    self.modified = True
+                else:
+                    lines.append(CookieCartLine(variant, quantity, self.prices.get(variant_id)))
+            self._items = EntryList(lines)
+        return self._items
+
+    def save(self, response):
+        """Écrit le cookie s'il a changé (le supprime si le panier est vide)."""
+        if not self.modified:
+            return response
+        if self.quantities:
+            response.set_signed_cookie(
+                CART_COOKIE, encode(self.quantities, self.prices), salt=CART_COOKIE_SALT,
+                max_age=CART_COOKIE_MAX_AGE, httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(CART_COOKIE, samesite='Lax')
+        self.modified = False
+        if self.adopted_cart_ids:
+            # Lignes désormais dans le cookie : l'ancien panier en base n'est plus lu
+            Cart.objects.filter(pk__in=self.adopted_cart_ids, user__isnull=True).delete()
+            self.adopted_cart_ids = set()
+        return response
@@ -0,0 +1,147 @@
+"""Mode dégradé quand la base de données ralentit.
+
+Chaque requête SQL du worker est chronométrée (``timed_execute``, branché
+sur chaque connexion par ``signals``) et alimente une moyenne mobile. Au-
+dessus de ``DB_SLOW_THRESHOLD`` le worker passe en mode dégradé, et n'en
+sort qu'en repassant sous ``DB_RECOVER_THRESHOLD`` ; sans mesure récente
+(``SAMPLE_MAX_AGE``), l'état est considéré comme rétabli pour qu'une
+requête serve de sonde.
+
+En mode dégradé :
+
+* ``page_cache`` sert la dernière version connue des pages du catalogue,
+  marquée périmée, et en fait recalculer une seule en arrière-plan ;
+* le travail accessoire (avis, agrégats de notes, produits similaires)
+  est remplacé par une valeur de repli via ``unless_degraded`` ;
+* le nombre de rendus de pages du catalogue simultanés est plafonné
+  (``MAX_DEGRADED_RENDERS``, tous workers confondus) : au-delà, une page
+  503 statique est renvoyée, pour garder des workers libres pour
+  ``order_create``, qui n'est jamais limitée. Le compteur commun suppose
+  un ``incr`` atomique ; avec ``FileBasedCache``, le plafond s'applique à
+  chaque worker séparément.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from .caching import atomic_backend
+
+logger = logging.getLogger(__name__)
+
+DB_SLOW_THRESHOLD = 0.3
+DB_RECOVER_THRESHOLD = 0.1
+EWMA_ALPHA = 0.2
+SAMPLE_MAX_AGE = 10
+MAX_DEGRADED_RENDERS = 4
+INFLIGHT_KEY = 'degradation:inflight'
+INFLIGHT_TIMEOUT = 60
+RETRY_AFTER = 30
+
+
+class LatencyTracker:
+    """Moyenne mobile exponentielle de la durée des requêtes SQL du worker."""
+
+    def __init__(self):
+        self.average = 0.0
+        self.sampled_at = 0.0
+        self.degraded = False
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def record(self, duration):
+        with self._lock:
+            self.average += EWMA_ALPHA * (duration - self.average)
+            self.sampled_at = time.monotonic()
+            if not self.degraded and self.average > DB_SLOW_THRESHOLD:
+                self.degraded = True
+                logger.warning("Base lente (%.0f ms en moyenne) : mode dégradé", self.average * 1000)
+            elif self.degraded and self.average < DB_RECOVER_THRESHOLD:
+                self.degraded = False
+                logger.warning("Base rétablie (%.0f ms en moyenne) : fin du mode dégradé", self.average * 1000)
+
+    @property
+    def is_degraded(self):
+        return self.degraded and time.monotonic() - self.sampled_at < SAMPLE_MAX_AGE
+
+    def stats(self):
+        return {
+            'average_ms': round(self.average * 1000, 1),
+            'degraded': self.is_degraded,
+            'shed': self.shed,
+        }
+
+
+tracker = LatencyTracker()
+
+
+def timed_execute(execute, sql, params, many, context):
+    start = time.monotonic()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tracker.record(time.monotonic() - start)
+
+
+def is_degraded():
+    return tracker.is_degraded
+
+
+def unless_degraded(compute, fallback):
+    """``compute()`` en temps normal, ``fallback()`` (sans base) en mode dégradé."""
+    if tracker.is_degraded:
+        tracker.shed += 1
+        return fallback()
+    return compute()
+
+
+# -------------------- admission --------------------
+_local_inflight = 0
+_local_inflight_lock = threading.Lock()
+
+
+@contextmanager
+def _local_render_slot():
+    global _local_inflight
+    with _local_inflight_lock:
+        _local_inflight += 1
+        inflight = _local_inflight
+    try:
+        yield inflight <= MAX_DEGRADED_RENDERS
+    finally:
+        with _local_inflight_lock:
+            _local_inflight -= 1
+
+
+@contextmanager
+def render_slot():
+    """Réserve un rendu de page du catalogue ; ``False`` si le plafond est atteint."""
+    if not atomic_backend(cache):
+        # incr non atomique : un compteur commun dériverait
+        with _local_render_slot() as allowed:
+            yield allowed
+        return
+    cache.add(INFLIGHT_KEY, 0, INFLIGHT_TIMEOUT)
+    try:
+        inflight = cache.incr(INFLIGHT_KEY)
+    except ValueError:
+        inflight = 1
+    try:
+        yield inflight <= MAX_DEGRADED_RENDERS
+    finally:
+        try:
+            cache.decr(INFLIGHT_KEY)
+        except ValueError:
+            pass
+
+
+def overloaded():
+    """Page 503 autonome : ni gabarit de base, ni processeur de contexte, ni base de données."""
+    tracker.shed += 1
+    response = HttpResponse(render_to_string('errors/503.html'), status=503)
+    response['Retry-After'] = RETRY_AFTER
+    return response
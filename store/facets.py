@@ -0,0 +1,176 @@
+"""Navigation à facettes du catalogue (catégorie, prix, note).
+
+Une seule requête groupée produit un « cube » de comptages
+``(catégorie, tranche de prix, note) → nombre de produits``.
+Chaque facette est ensuite calculée en Python à partir du cube, en
+appliquant les autres filtres mais pas le sien : cocher une catégorie ne
+fait pas disparaître les autres. Le cube est mis en cache par signature
+de filtre (le texte recherché), les filtres à facettes ne coûtant rien.
+
+La vitrine ne montre que les produits disponibles : la disponibilité n'est
+pas une facette.
+"""
+import hashlib
+from collections import Counter
+
+from django.db.models import Case, Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Floor
+
+from .caching import tiered
+from .models import Category, ProductVariant
+
+FACET_CACHE_TIMEOUT = 120
+FACET_NAMESPACE = 'facets'
+
+# (borne basse incluse, borne haute exclue) en MAD, sur le prix de variante le plus bas
+PRICE_BANDS = (
+    (0, 50, "Moins de 50 MAD"),
+    (50, 100, "50 – 100 MAD"),
+    (100, 200, "100 – 200 MAD"),
+    (200, 500, "200 – 500 MAD"),
+    (500, None, "Plus de 500 MAD"),
+)
+MIN_RATINGS = (4, 3, 2, 1)
+
+
+def with_min_price(queryset):
+    """Annote ``min_price`` : prix de variante le plus bas, ou prix du produit."""
+    cheapest = ProductVariant.objects.filter(product=OuterRef('pk')).order_by('price').values('price')[:1]
+    return queryset.annotate(
+        min_price=Coalesce(Subquery(cheapest), 'price', output_field=DecimalField(max_digits=10, decimal_places=2))
+    )
+
+
+def _price_band_expression():
+    whens = []
+    for index, (low, high, _) in enumerate(PRICE_BANDS):
+        condition = Q(min_price__gte=low)
+        if high is not None:
+            condition &= Q(min_price__lt=high)
+        whens.append(When(condition, then=Value(index)))
+    return Case(*whens, default=Value(0), output_field=IntegerField())
+
+
+class FacetFilters:
+    """Filtres à facettes lus depuis ``request.GET``."""
+
+    def __init__(self, categories=(), price_bands=(), min_rating=None):
+        self.categories = set(categories)
+        self.price_bands = set(price_bands)
+        self.min_rating = min_rating
+
+    @classmethod
+    def from_query(cls, query):
+        def ints(name, valid=None):
+            values = set()
+            for raw in query.getlist(name):
+                try:
+                    value = int(raw)
+                except (TypeError, ValueError):
+                    continue
+                if valid is None or value in valid:
+                    values.add(value)
+            return values
+
+        ratings = ints('rating', MIN_RATINGS)
+        return cls(
+            categories=ints('category'),
+            price_bands=ints('price', range(len(PRICE_BANDS))),
+            min_rating=max(ratings) if ratings else None,
+        )
+
+    @property
+    def is_active(self):
+        return bool(self.categories or self.price_bands or self.min_rating)
+
+    def apply(self, queryset):
+        """Filtre un queryset de ``Product`` (``min_price`` est annoté si besoin)."""
+        if self.categories:
+            queryset = queryset.filter(category_id__in=self.categories)
+        if self.min_rating:
+            queryset = queryset.filter(rating_summary__average__gte=self.min_rating)
+        if self.price_bands:
+            price_filter = Q()
+            for index in self.price_bands:
+                low, high, _ = PRICE_BANDS[index]
+                band = Q(min_price__gte=low)
+                if high is not None:
+                    band &= Q(min_price__lt=high)
+                price_filter |= band
+            queryset = with_min_price(queryset).filter(price_filter)
+        return queryset
+
+    def matches(self, cell, skip=None):
+        category, band, rating = cell
+        return (
+            (skip == 'category' or not self.categories or category in self.categories)
+            and (skip == 'price' or not self.price_bands or band in self.price_bands)
+            and (skip == 'rating' or not self.min_rating or rating >= self.min_rating)
+        )
+
+
+def bump_version():
+    """Invalide tous les cubes en cache (appelé par les signaux du catalogue)."""
+    tiered.bump(FACET_NAMESPACE)
+
+
+def facet_cube(queryset, signature):
+    """Comptages groupés pour ``queryset``, en cache sous ``signature``."""
+    def compute():
+        rows = (
+            with_min_price(queryset.order_by())
+            .annotate(
+                band=_price_band_expression(),
+                stars=Coalesce(Floor('rating_summary__average'), Value(0), output_field=IntegerField()),
+            )
+            .values('category_id', 'band', 'stars')
+            .annotate(n=Count('pk'))
+            .order_by()
+        )
+        return {
+            (row['category_id'], row['band'], int(row['stars'])): row['n']
+            for row in rows
+        }
+
+    key = hashlib.md5(signature.encode()).hexdigest()
+    return tiered.get_or_set(key, compute, FACET_CACHE_TIMEOUT, namespace=FACET_NAMESPACE)
+
+
+def compute_facets(queryset, signature, filters, categories=None):
+    """Facettes prêtes pour le gabarit, pour le contexte ``filters``."""
+    if categories is None:
+        categories = Category.objects.only('id', 'name')
+    cube = facet_cube(queryset, signature)
+    by_category, by_band, by_rating = Counter(), Counter(), Counter()
+    total = 0
+    for cell, n in cube.items():
+        category, band, rating = cell
+        if filters.matches(cell, skip='category'):
+            by_category[category] += n
+        if filters.matches(cell, skip='price'):
+            by_band[band] += n
+        if filters.matches(cell, skip='rating'):
+            for threshold in MIN_RATINGS:
+                if rating >= threshold:
+                    by_rating[threshold] += n
+        if filters.matches(cell):
+            total += n
+
+    return {
+        'total': total,
+        'categories': [
+            {'id': category.id, 'name': category.name, 'count': by_category.get(category.id, 0),
+             'selected': category.id in filters.categories}
+            for category in categories
+        ],
+        'price_bands': [
+            {'value': index, 'label': label, 'count': by_band.get(index, 0),
+             'selected': index in filters.price_bands}
+            for index, (_, _, label) in enumerate(PRICE_BANDS)
+        ],
+        'ratings': [
+            {'value': threshold, 'count': by_rating.get(threshold, 0),
+             'selected': threshold == filters.min_rating}
+            for threshold in MIN_RATINGS
+        ],
+    }
@@ -0,0 +1,114 @@
+"""Cache des fragments HTML des cartes produit.
+
+Une carte est rendue une fois par (produit, version du produit, style,
+langue), puis resservie telle quelle par ``home``, ``product_list`` et les
+produits similaires de ``product_detail``. La version d'un produit est la
+génération du catalogue publiée par sa dernière modification : les signaux
+de ``Product``, ``ProductVariant``, ``ProductImage`` et ``Category`` la
+réécrivent (``bump_cards``) une fois la transaction validée, sans toucher
+aux cartes des autres produits.
+
+Les versions des cartes d'une page sont lues en une fois (``prefetch``,
+un ``get_many``) puis gardées ``VERSION_TTL`` secondes dans le cache local.
+Un worker dont l'instantané est plus ancien que la version ne met pas la
+carte en cache : elle serait rendue avec les anciennes données.
+
+Les cartes ne contiennent rien qui dépende de l'utilisateur : elles sont
+rendues sans requête ni processeurs de contexte, et le bouton « Ajouter »
+n'a pas de jeton CSRF (``add_to_cart`` vérifie l'origine de la requête).
+"""
+import threading
+import time
+
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .caching import MISSING, VERSION_TTL, tiered
+from .catalog import get_catalog
+from .models import CatalogVersion
+
+CARD_TEMPLATES = {
+    'home': 'includes/product_card_home.html',
+    'list': 'includes/product_card_list.html',
+    'related': 'includes/product_card_related.html',
+}
+CARD_TIMEOUT = 60 * 60 * 24
+
+# Produits modifiés par la transaction en cours du thread
+_pending = threading.local()
+
+
+def version_key(product_id):
+    return f'card-version:{product_id}'
+
+
+def card_versions(product_ids):
+    """Version de la carte de chaque produit ; un seul ``get_many`` pour ce que le cache local n'a pas."""
+    now = time.time()
+    versions, missing = {}, []
+    for pk in product_ids:
+        version = tiered.local.get(version_key(pk), now)
+        if version is MISSING:
+            missing.append(pk)
+        else:
+            versions[pk] = version
+    if missing:
+        found = tiered.shared.get_many([version_key(pk) for pk in missing])
+        for pk in missing:
+            key = version_key(pk)
+            version = found.get(key)
+            if version is None:
+                # Version absente (jamais écrite, ou expulsée) : elle repart de la génération courante
+                generation = get_catalog().generation
+                tiered.shared.add(key, generation, None)
+                version = tiered.shared.get(key, generation)
+            tiered.local.set(key, version, now + VERSION_TTL)
+            versions[pk] = version
+    return versions
+
+
+def prefetch(products):
+    """Charge en une fois les versions des cartes d'une page."""
+    card_versions([product.id for product in products])
+
+
+def _flush_versions():
+    product_ids = getattr(_pending, 'product_ids', None)
+    if not product_ids:
+        return
+    _pending.product_ids = set()
+    # Exécuté après ``catalog._bump`` (enregistré plus tôt dans la transaction)
+    generation = CatalogVersion.current()
+    tiered.shared.set_many({version_key(pk): generation for pk in product_ids}, None)
+    for pk in product_ids:
+        tiered.local.delete(version_key(pk))
+
+
+def bump_cards(*product_ids):
+    """Invalide toutes les cartes (styles et langues) de ``product_ids`` à la validation de la transaction.
+
+    Les produits d'une même transaction sont écrits ensemble, par le premier
+    rappel ``on_commit`` exécuté ; les suivants ne trouvent plus rien.
+    """
+    if not hasattr(_pending, 'product_ids'):
+        _pending.product_ids = set()
+    _pending.product_ids.update(product_ids)
+    transaction.on_commit(_flush_versions)
+
+
+def render_card(product, style='list'):
+    template_name = CARD_TEMPLATES[style]
+
+    def render():
+        return render_to_string(template_name, {'product': product})
+
+    version = card_versions([product.id])[product.id]
+    if get_catalog().generation < version:
+        html = render()
+    else:
+        html = tiered.get_or_set(
+            f'card:{product.id}:{version}:{style}:{get_language()}', render, CARD_TIMEOUT, stale_ttl=0,
+        )
+    return mark_safe(html)
@@ -0,0 +1,270 @@
+"""En-têtes de cache HTTP des pages du catalogue (ETag, Last-Modified, 304).
+
+Chaque page décorée par ``conditional_page`` décrit son état par une
+fonction bon marché (génération du catalogue, ``updated_at`` du produit,
+dernier avis approuvé) évaluée avant la vue : si le client possède déjà
+cette version, la vue n'est pas exécutée et une réponse 304 est renvoyée.
+
+L'état est complété par ce qui varie selon le visiteur et apparaît dans la
+page (utilisateur, nombre d'articles du panier, jeton CSRF) ; les pages
+portant des messages flash ne sont jamais validées.
+
+Les réponses anonymes sans cookie posé sont publiques (``s-maxage`` pour
+le proxy inverse, ``stale-while-revalidate``) et portent un en-tête
+``Surrogate-Key`` listant les produits et catégories affichés ; les
+signaux appellent ``purge`` pour que le proxy oublie ces clés. Les
+formulaires de ces pages n'ont pas de jeton CSRF (``add_to_cart`` vérifie
+l'origine, ``direct_order`` est ouvert en GET) : un jeton poserait un
+cookie et rendrait la page privée. Les réponses privées n'ont pas
+d'en-tête ``Surrogate-Key``.
+"""
+import hashlib
+import logging
+import threading
+from functools import wraps
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.dispatch import Signal, receiver
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .caching import tiered
+from .catalog import get_catalog
+from .cookie_cart import CART_COOKIE
+from .degradation import is_degraded
+from .models import CatalogVersion, CommunityPost
+from .utils import get_cart_count
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE = 60
+SHARED_MAX_AGE = 600
+STALE_WHILE_REVALIDATE = 300
+STAMP_TIMEOUT = 300
+PURGE_TIMEOUT = 2
+REVIEWS_NAMESPACE = 'reviews'
+
+# Envoyé (après validation de la transaction) avec ``keys`` : clés à oublier
+surrogate_purge = Signal()
+
+
+# -------------------- horodatages --------------------
+def catalog_modified(generation):
+    """Date de publication de ``generation`` ; la clé change avec la génération."""
+    return tiered.get_or_set(
+        f'catalog:modified:{generation}',
+        lambda: CatalogVersion.objects.filter(pk=1).values_list('updated_at', flat=True).first(),
+        STAMP_TIMEOUT,
+    )
+
+
+def review_stamp(product_id=None):
+    """``(nombre, dernière modification)`` des avis approuvés, d'un produit ou de tous."""
+    def compute():
+        reviews = CommunityPost.objects.filter(is_approved=True)
+        if product_id is not None:
+            reviews = reviews.filter(product_id=product_id)
+        stamp = reviews.aggregate(count=Count('id'), last=Max('updated_at'))
+        return stamp['count'], stamp['last']
+
+    key = f'stamp:{product_id or "all"}'
+    if is_degraded():
+        # Base lente : valeur connue, ou aucune (la page n'est alors validée que par le catalogue)
+        return tiered.get(key, (None, None), namespace=REVIEWS_NAMESPACE)
+    return tiered.get_or_set(key, compute, STAMP_TIMEOUT, namespace=REVIEWS_NAMESPACE, stale_ttl=0)
+
+
+def bump_reviews():
+    tiered.bump(REVIEWS_NAMESPACE)
+
+
+# -------------------- état des pages --------------------
+def _latest(*moments):
+    moments = [moment for moment in moments if moment is not None]
+    return max(moments) if moments else None
+
+
+def home_state(request):
+    from .trending import top_product_ids
+    generation = get_catalog().generation
+    count, last_review = review_stamp()
+    parts = (generation, count, last_review, tuple(top_product_ids()))
+    return parts, _latest(catalog_modified(generation), last_review)
+
+
+def listing_state(request):
+    generation = get_catalog().generation
+    count, last_review = review_stamp()
+    return (generation, count, last_review), _latest(catalog_modified(generation), last_review)
+
+
+def product_state(request, pk):
+    catalog = get_catalog()
+    product = catalog.get_product(pk)
+    if product is None:
+        return None
+    count, last_review = review_stamp(product.id)
+    # La génération couvre aussi les produits similaires affichés sur la fiche
+    parts = (catalog.generation, product.updated_at, count, last_review)
+    return parts, _latest(product.updated_at, last_review)
+
+
+def reviews_state(request, pk):
+    generation = get_catalog().generation
+    count, last_review = review_stamp(pk)
+    return (generation, count, last_review), _latest(catalog_modified(generation), last_review)
+
+
+# -------------------- clés de substitution --------------------
+def product_keys(products):
+    keys = set()
+    for product in products:
+        keys.add(f'product-{product.id}')
+        if product.category_id:
+            keys.add(f'category-{product.category_id}')
+    return keys
+
+
+def add_surrogate_keys(request, *keys):
+    """Ajoute des clés à l'en-tête ``Surrogate-Key`` de la réponse en cours."""
+    if not hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys = set()
+    for key in keys:
+        if isinstance(key, str):
+            request.surrogate_keys.add(key)
+        else:
+            request.surrogate_keys.update(key)
+
+
+# -------------------- décorateur --------------------
+def _has_pending_messages(request):
+    return bool(request.COOKIES.get('messages') or request.session.get('_messages'))
+
+
+def _visitor(request):
+    """Ce qui, dans la page, dépend du visiteur ; vide pour un visiteur sans session."""
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    if request.user.is_authenticated:
+        return ('user', request.user.pk, get_cart_count(request), csrf)
+    if request.session.session_key or csrf or CART_COOKIE in request.COOKIES:
+        return ('session', get_cart_count(request), csrf)
+    return ()
+
+
+def _etag(parts, visitor):
+    digest = hashlib.sha1(repr((parts, visitor)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def conditional_page(state, on_not_modified=None):
+    """Valide la page avec ``state(request, *args, **kwargs)`` avant d'exécuter la vue.
+
+    ``state`` renvoie ``(parties, dernière_modification)`` ou ``None`` pour ne
+    pas valider (la vue répond alors normalement, par exemple une 404).
+    ``on_not_modified`` est appelé quand une 304 remplace la vue.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _has_pending_messages(request):
+                return view(request, *args, **kwargs)
+
+            current = state(request, *args, **kwargs)
+            if current is None:
+                return view(request, *args, **kwargs)
+            parts, last_modified = current
+            visitor = _visitor(request)
+            etag = _etag(parts, visitor)
+            # Last-Modified ne reflète pas le panier : seulement pour les visiteurs sans session
+            last_modified = last_modified.timestamp() if last_modified and not visitor else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                if on_not_modified is not None:
+                    on_not_modified(request, *args, **kwargs)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+            _cache_headers(request, response, visitor)
+            return response
+        return wrapper
+    return decorator
+
+
+def _sets_cookies(request, response):
+    """Vrai si la réponse posera un cookie (ici ou dans les middlewares de session et CSRF)."""
+    return bool(
+        response.cookies
+        or request.session.modified
+        or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def _cache_headers(request, response, visitor):
+    patch_vary_headers(response, ('Cookie',))
+    if visitor or _sets_cookies(request, response):
+        patch_cache_control(response, private=True, no_cache=True)
+        return
+    # Clés de substitution : utiles seulement aux réponses que le proxy garde
+    keys = getattr(request, 'surrogate_keys', None)
+    if keys:
+        response['Surrogate-Key'] = ' '.join(sorted(keys))
+    patch_cache_control(
+        response, public=True, max_age=MAX_AGE, s_maxage=SHARED_MAX_AGE,
+        stale_while_revalidate=STALE_WHILE_REVALIDATE,
+    )
+
+
+# -------------------- purge --------------------
+# Clés demandées par la transaction en cours du thread
+_pending = threading.local()
+
+
+def _flush_purge():
+    keys = getattr(_pending, 'keys', None)
+    if not keys:
+        return
+    _pending.keys = set()
+    surrogate_purge.send(sender=None, keys=sorted(keys))
+
+
+def purge(*keys):
+    """Demande l'oubli de ``keys`` par le proxy, une fois la transaction validée.
+
+    Les clés demandées pendant une même transaction sont envoyées ensemble,
+    par le premier rappel ``on_commit`` exécuté ; les suivants ne trouvent
+    plus rien. Les clés d'une transaction annulée partent avec la suivante.
+    """
+    if not keys:
+        return
+    if not hasattr(_pending, 'keys'):
+        _pending.keys = set()
+    _pending.keys.update(keys)
+    transaction.on_commit(_flush_purge)
+
+
+@receiver(surrogate_purge)
+def purge_reverse_proxy(sender, keys, **kwargs):
+    """Transmet la purge à ``SURROGATE_PURGE_URL`` (Varnish, Fastly…) si configurée.
+
+    La requête part dans un thread : la réponse n'attend pas le proxy.
+    """
+    logger.info("Purge des clés : %s", ' '.join(keys))
+    url = getattr(settings, 'SURROGATE_PURGE_URL', '')
+    if not url:
+        return
+
+    def send():
+        try:
+            requests.request('PURGE', url, headers={'Surrogate-Key': ' '.join(keys)}, timeout=PURGE_TIMEOUT)
+        except requests.RequestException as exc:
+            logger.warning("Échec de la purge du proxy : %s", exc)
+
+    threading.Thread(target=send, daemon=True).start()
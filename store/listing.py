@@ -0,0 +1,186 @@
+"""Index de tri en mémoire pour la navigation du catalogue.
+
+Pour chaque couple (catégorie, ordre de tri), l'index garde une
+``SortedList`` compacte de tuples ``(clé, id)``. Une page de listing devient
+une simple tranche de cette liste dont les IDs sont résolus dans l'instantané
+du catalogue, au lieu de refaire le tri complet en base à chaque requête.
+
+L'index est propre à chaque processus : il est tenu à jour par les signaux
+pour les modifications faites localement, et entièrement rechargé quand la
+génération du catalogue change ou après ``LISTING_INDEX_TTL`` secondes
+(notes modifiées par les autres workers).
+"""
+import heapq
+import threading
+import time
+from collections import namedtuple
+from itertools import islice
+
+from sortedcontainers import SortedList
+
+from .facets import with_min_price
+from .models import Product
+
+LISTING_INDEX_TTL = 300
+
+SORT_CHOICES = (
+    ('newest', "Nouveautés"),
+    ('price_asc', "Prix croissant"),
+    ('price_desc', "Prix décroissant"),
+    ('rating', "Mieux notés"),
+    ('name', "Nom (A-Z)"),
+)
+SORT_KEYS = {key for key, _ in SORT_CHOICES}
+DEFAULT_SORT = 'newest'
+
+# Ordre équivalent en base, pour les listings que l'index ne sait pas servir
+DB_ORDERING = {
+    'newest': ('-created_at', '-pk'),
+    'price_asc': ('min_price', 'pk'),
+    'price_desc': ('-min_price', '-pk'),
+    'rating': ('-rating_summary__average', '-rating_summary__count', '-pk'),
+    'name': ('name', 'pk'),
+}
+
+ListingEntry = namedtuple('ListingEntry', 'category_id created_at name price rating reviews')
+
+ENTRY_FIELDS = (
+    'pk', 'category_id', 'created_at', 'name', 'min_price',
+    'rating_summary__average', 'rating_summary__count',
+)
+
+
+def sort_key(entry, sort):
+    """Clé croissante de ``entry`` pour l'ordre ``sort``."""
+    if sort == 'newest':
+        return (-entry.created_at,)
+    if sort == 'price_asc':
+        return (entry.price,)
+    if sort == 'price_desc':
+        return (-entry.price,)
+    if sort == 'rating':
+        return (-entry.rating, -entry.reviews)
+    return (entry.name,)
+
+
+def order_queryset(queryset, sort):
+    """Trie un queryset de ``Product`` en base selon ``sort``."""
+    if sort in ('price_asc', 'price_desc') and 'min_price' not in queryset.query.annotations:
+        queryset = with_min_price(queryset)
+    return queryset.order_by(*DB_ORDERING[sort])
+
+
+class ListingIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._lists = {}
+        self.built_at = None
+        self.generation = None
+
+    @staticmethod
+    def _queryset():
+        return with_min_price(Product.objects.filter(is_available=True)).values_list(*ENTRY_FIELDS)
+
+    @staticmethod
+    def _entry(row):
+        _, category_id, created_at, name, price, rating, reviews = row
+        return ListingEntry(
+            category_id, created_at.timestamp(), (name or '').casefold(),
+            float(price or 0), rating or 0.0, reviews or 0,
+        )
+
+    def _add(self, pk, entry):
+        self._entries[pk] = entry
+        for sort in SORT_KEYS:
+            key = sort_key(entry, sort) + (pk,)
+            for scope in (None, entry.category_id):
+                self._lists.setdefault((scope, sort), SortedList()).add(key)
+
+    def _discard(self, pk):
+        entry = self._entries.pop(pk, None)
+        if entry is None:
+            return
+        for sort in SORT_KEYS:
+            key = sort_key(entry, sort) + (pk,)
+            for scope in (None, entry.category_id):
+                self._lists[(scope, sort)].discard(key)
+
+    def load(self, generation=None):
+        """Recharge tout l'index en une requête."""
+        rows = list(self._queryset())
+        with self._lock:
+            self._entries = {}
+            self._lists = {}
+            for row in rows:
+                self._add(row[0], self._entry(row))
+            self.built_at = time.monotonic()
+            self.generation = generation
+
+    @property
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > LISTING_INDEX_TTL
+
+    def refresh_product(self, pk):
+        """Met à jour un seul produit (ou le retire s'il n'est plus disponible)."""
+        if self.built_at is None:
+            return
+        row = self._queryset().filter(pk=pk).first()
+        with self._lock:
+            self._discard(pk)
+            if row is not None:
+                self._add(pk, self._entry(row))
+
+    def remove_product(self, pk):
+        with self._lock:
+            self._discard(pk)
+
+    def _scopes(self, categories, sort):
+        if not categories:
+            return [self._lists.get((None, sort), [])]
+        return [self._lists.get((category, sort), []) for category in categories]
+
+    def count(self, categories=()):
+        with self._lock:
+            return sum(len(keys) for keys in self._scopes(categories, DEFAULT_SORT))
+
+    def ids(self, categories, sort, start, stop):
+        """IDs des produits aux positions ``[start:stop]`` pour ``sort``."""
+        with self._lock:
+            scopes = self._scopes(categories, sort)
+            if len(scopes) == 1:
+                keys = scopes[0][start:stop]
+            else:
+                keys = list(islice(heapq.merge(*scopes), start, stop))
+        return [key[-1] for key in keys]
+
+
+class IndexedListing:
+    """Séquence paginable (``Paginator``) adossée à l'index de tri."""
+
+    def __init__(self, index, resolve, categories=(), sort=DEFAULT_SORT):
+        self.index = index
+        self.resolve = resolve
+        self.categories = list(categories)
+        self.sort = sort
+
+    def count(self):
+        return self.index.count(self.categories)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        return self.resolve(self.index.ids(self.categories, self.sort, item.start or 0, item.stop))
+
+
+listing_index = ListingIndex()
+
+
+def get_listing_index(generation=None):
+    """Index du processus courant, (re)chargé s'il est absent ou périmé."""
+    if listing_index.is_stale or listing_index.generation != generation:
+        listing_index.load(generation)
+    return listing_index
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import catalog_file
+from store.models import CatalogVersion
+
+
+class Command(BaseCommand):
+    help = "Écrit le fichier binaire du catalogue partagé entre les workers (mmap)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--if-stale', action='store_true',
+                            help="Ne réécrit le fichier que si la génération du catalogue a changé.")
+        parser.add_argument('--watch', type=int, metavar='SECONDES',
+                            help="Surveille la génération et réécrit le fichier à chaque changement.")
+
+    def build(self, only_if_stale):
+        generation = CatalogVersion.current()
+        if only_if_stale and catalog_file.read_generation() == generation:
+            return
+        count = catalog_file.write_catalog_file(generation)
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} produit(s) écrit(s) dans {catalog_file.catalog_path()} (génération {generation})."
+        ))
+
+    def handle(self, *args, **options):
+        if not options['watch']:
+            self.build(options['if_stale'])
+            return
+        while True:
+            self.build(True)
+            time.sleep(options['watch'])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from store import recommendations
+
+
+class Command(BaseCommand):
+    help = "Calcule les produits « souvent achetés ensemble » à partir des commandes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Reconstruit toute la matrice au lieu de traiter les nouvelles commandes.")
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K,
+                            help="Nombre de voisins conservés par produit.")
+        parser.add_argument('--metric', choices=recommendations.METRICS, default=recommendations.DEFAULT_METRIC)
+
+    def handle(self, *args, **options):
+        if options['full']:
+            count = recommendations.rebuild(options['top_k'], options['metric'])
+        else:
+            count = recommendations.update(options['top_k'], options['metric'])
+        self.stdout.write(self.style.SUCCESS(f"{count} commande(s) traitée(s)."))
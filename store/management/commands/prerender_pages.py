@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import prerender
+
+
+class Command(BaseCommand):
+    help = "Pré-rend les pages publiques (accueil, catégories, fiches produit…) pour chaque langue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true',
+                            help="Ne rend que les pages supprimées depuis le dernier passage (et l'accueil).")
+        parser.add_argument('--watch', type=int, metavar='SECONDES',
+                            help="Régénère les pages manquantes à intervalle régulier.")
+
+    def build(self, only_missing):
+        count = prerender.build_missing() if only_missing else prerender.build_all()
+        self.stdout.write(self.style.SUCCESS(f"{count} page(s) écrite(s) dans {prerender.root()}."))
+
+    def handle(self, *args, **options):
+        if not options['watch']:
+            self.build(options['missing'])
+            return
+        while True:
+            self.build(True)
+            time.sleep(options['watch'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store import changes
+
+
+class Command(BaseCommand):
+    help = "Supprime les traces de suppression du catalogue plus anciennes que la période de rétention."
+
+    def handle(self, *args, **options):
+        count = changes.purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"{count} trace(s) supprimée(s)."))
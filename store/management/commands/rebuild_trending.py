@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store import trending
+
+
+class Command(BaseCommand):
+    help = "Recalcule les scores de tendance des produits à partir des commandes récentes."
+
+    def handle(self, *args, **options):
+        count = trending.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{count} produit(s) noté(s)."))
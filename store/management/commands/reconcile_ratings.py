@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store import ratings
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats de notes de tous les produits."
+
+    def handle(self, *args, **options):
+        count = ratings.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"{count} produit(s) recalculé(s)."))
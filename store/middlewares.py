@@ -1,5 +1,8 @@
 from django.http import HttpResponseNotFound
 from django.shortcuts import render
+from django.utils.cache import patch_vary_headers
+
+from . import compression, preload
 
 class MediaNotFoundMiddleware:
     def __init__(self, get_response):
@@ -11,4 +14,60 @@ class MediaNotFoundMiddleware:
             return render(request, 'errors/404.html', {
                 'custom_message': "L'image demandée n'est plus disponible"
             }, status=404)
-        return response
\ No newline at end of file
+        return response
+
+class CompressionMiddleware:
+    """Compresse les réponses textuelles (voir ``store.compression``)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not compression.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            precompressed = getattr(response, 'precompressed', None)
+            if precompressed is not None and precompressed[0] == encoding:
+                content = precompressed[1]
+            elif len(response.content) >= compression.MIN_SIZE:
+                content = compression.compress(response.content, encoding)
+            else:
+                return response
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        # Le corps envoyé n'est plus identique octet pour octet : validateur faible
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class PreloadMiddleware:
+    """Annonce les ressources critiques des pages HTML (voir ``store.preload``)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method in ('GET', 'HEAD')
+            and response.status_code == 200
+            and response.get('Content-Type', '').startswith('text/html')
+            and not response.has_header('Link')
+        ):
+            response['Link'] = ', '.join(preload.links())
+        return response
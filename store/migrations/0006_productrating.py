@@ -0,0 +1,65 @@
+# Generated by Django 4.2.23 on 2026-10-16 20:34
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def populate_ratings(apps, schema_editor):
+    # Agrégation recopiée de store.ratings.reconcile, sur les modèles historiques
+    Product = apps.get_model('store', 'Product')
+    CommunityPost = apps.get_model('store', 'CommunityPost')
+    ProductRating = apps.get_model('store', 'ProductRating')
+    rows = (
+        CommunityPost.objects.filter(is_approved=True, rating__in=range(1, 6))
+        .values('product_id', 'rating')
+        .annotate(n=Count('pk'))
+        .order_by()
+    )
+    summaries = defaultdict(dict)
+    for row in rows:
+        summaries[row['product_id']][row['rating']] = row['n']
+    ratings = []
+    for product_id in Product.objects.values_list('pk', flat=True).order_by('pk'):
+        stars = summaries.get(product_id, {})
+        count = sum(stars.values())
+        total = sum(rating * n for rating, n in stars.items())
+        ratings.append(ProductRating(
+            product_id=product_id,
+            average=total / count if count else 0,
+            count=count,
+            total=total,
+            **{f'stars_{rating}': stars.get(rating, 0) for rating in range(1, 6)},
+        ))
+    ProductRating.objects.bulk_create(ratings, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_searchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRating',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='store.product', verbose_name='Produit')),
+                ('average', models.FloatField(db_index=True, default=0, verbose_name='Note moyenne')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name="Nombre d'avis")),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Somme des notes')),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Note produit',
+                'verbose_name_plural': 'Notes produits',
+            },
+        ),
+        migrations.RunPython(populate_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.23 on 2026-10-16 20:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTrend',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='store.product', verbose_name='Produit')),
+                ('score', models.FloatField(db_index=True, default=0, verbose_name='Score')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tendance produit',
+                'verbose_name_plural': 'Tendances produits',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-16 20:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_producttrend'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductViewCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('views', models.PositiveBigIntegerField(default=0, verbose_name='Vues')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_counts', to='store.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Vues produit',
+                'verbose_name_plural': 'Vues produits',
+                'indexes': [models.Index(fields=['day', 'product'], name='store_produ_day_d2d40c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productviewcount',
+            constraint=models.UniqueConstraint(fields=('product', 'day', 'shard'), name='unique_product_view_shard'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.23 on 2026-10-16 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_productviewcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Catégorie'), ('product', 'Produit'), ('variant', 'Variante')], max_length=20, verbose_name='Type')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID supprimé')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Supprimé le')),
+            ],
+            options={
+                'verbose_name': 'Suppression du catalogue',
+                'verbose_name_plural': 'Suppressions du catalogue',
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='productvariant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-16 21:30
+
+import math
+
+from django.db import migrations
+
+
+def scores_to_log(apps, schema_editor):
+    # Scores linéaires → log2 (voir store.trending) ; un score nul ne compte plus
+    ProductTrend = apps.get_model('store', 'ProductTrend')
+    ProductTrend.objects.filter(score__lte=0).delete()
+    for trend in ProductTrend.objects.all():
+        trend.score = math.log2(trend.score)
+        trend.save(update_fields=['score'])
+
+
+def scores_from_log(apps, schema_editor):
+    ProductTrend = apps.get_model('store', 'ProductTrend')
+    for trend in ProductTrend.objects.all():
+        trend.score = math.pow(2.0, trend.score)
+        trend.save(update_fields=['score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_cartitem_unit_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(scores_to_log, scores_from_log),
+    ]
@@ -62,3 +62,41 @@ class CommunityPost(models.Model):
 
     def __str__(self):
         return f"{self.title} - {self.author.username}"
+
+
+class ProductRating(models.Model):
+    """Agrégats des avis approuvés d'un produit, maintenus par store.ratings."""
+
+    product = models.OneToOneField(
+        'store.Product',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_summary',
+        verbose_name="Produit"
+    )
+    average = models.FloatField(default=0, db_index=True, verbose_name="Note moyenne")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre d'avis")
+    total = models.PositiveIntegerField(default=0, verbose_name="Somme des notes")
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Note produit"
+        verbose_name_plural = "Notes produits"
+
+    def __str__(self):
+        return f"{self.product_id}: {self.average:.1f}/5 ({self.count})"
+
+    def histogram(self):
+        """Répartition des notes, de 5 à 1 étoiles, avec pourcentages."""
+        return [
+            {
+                'stars': stars,
+                'count': getattr(self, f'stars_{stars}'),
+                'percent': round(100 * getattr(self, f'stars_{stars}') / self.count) if self.count else 0,
+            }
+            for stars in range(5, 0, -1)
+        ]
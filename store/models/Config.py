@@ -1,4 +1,7 @@
 from django.db import models
+from django.utils import timezone
+
+from store.caching import tiered
 
 
 class SiteConfig(models.Model):
@@ -16,9 +19,71 @@ class SiteConfig(models.Model):
     def __str__(self) -> str:
         return "Configuration du site"
 
+    CACHE_KEY = 'siteconfig'
+    CACHE_TIMEOUT = 300
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        tiered.delete(self.CACHE_KEY)
+
     @classmethod
     def get_solo(cls) -> "SiteConfig":
         obj, _ = cls.objects.get_or_create(pk=1)
         return obj
 
+    @classmethod
+    def get_cached(cls) -> "SiteConfig":
+        """Configuration lue via le cache, pour les lectures fréquentes."""
+        return tiered.get_or_set(cls.CACHE_KEY, cls.get_solo, cls.CACHE_TIMEOUT)
+
+
+class CatalogVersion(models.Model):
+    """Compteur de génération du catalogue, incrémenté à chaque modification.
+
+    Les workers comparent leur instantané du catalogue à cette valeur pour
+    savoir quand le reconstruire (voir ``store.catalog``).
+    """
+
+    generation = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Version du catalogue"
+        verbose_name_plural = "Version du catalogue"
+
+    def __str__(self) -> str:
+        return f"Catalogue v{self.generation}"
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list('generation', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls) -> None:
+        if not cls.objects.filter(pk=1).update(
+            generation=models.F('generation') + 1, updated_at=timezone.now()
+        ):
+            cls.objects.get_or_create(pk=1, defaults={'generation': 1})
+
+
+class BatchCheckpoint(models.Model):
+    """Position d'avancement d'un traitement par lots incrémental (dernier ID traité)."""
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="Traitement")
+    position = models.PositiveBigIntegerField(default=0, verbose_name="Dernier ID traité")
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        verbose_name = "Point de reprise"
+        verbose_name_plural = "Points de reprise"
+
+    def __str__(self) -> str:
+        return f"{self.name} @ {self.position}"
+
+    @classmethod
+    def get(cls, name: str) -> int:
+        return cls.objects.filter(name=name).values_list('position', flat=True).first() or 0
+
+    @classmethod
+    def set(cls, name: str, position: int) -> None:
+        cls.objects.update_or_create(name=name, defaults={'position': position})
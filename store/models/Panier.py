@@ -36,6 +36,10 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE)  # ✅ changé ici
     quantity = models.PositiveIntegerField(default=1)
+    # Prix de la variante à l'ajout (ou dernier prix vu) : signale un changement de prix
+    unit_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Prix à l'ajout"
+    )
 
     class Meta:
         constraints = [
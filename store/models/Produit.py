@@ -3,7 +3,7 @@ import logging
 from django.db import models
 from django.urls import reverse
 from PIL import Image
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -14,6 +14,7 @@ class Category(models.Model):
     name_ar = models.CharField(max_length=100, blank=True, verbose_name="Nom (Arabe)")
     description = models.TextField(blank=True, verbose_name="Description")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Catégorie"
@@ -39,7 +40,7 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Catégorie", related_name='products')
     is_available = models.BooleanField(default=True, verbose_name="Disponible")
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     default_variant = models.ForeignKey(
         'ProductVariant',
@@ -92,15 +93,27 @@ class Product(models.Model):
                 pass
         super().delete(*args, **kwargs)
 
+    def get_rating_summary(self):
+        """Agrégats dénormalisés (``ProductRating``) ou None si aucun avis."""
+        try:
+            return self.rating_summary
+        except ObjectDoesNotExist:
+            return None
+
     def average_rating(self):
-        from django.db.models import Avg
-        return self.community_posts.filter(
-            rating__isnull=False,
-            is_approved=True
-        ).aggregate(Avg('rating'))['rating__avg'] or 0
+        summary = self.get_rating_summary()
+        return round(summary.average, 1) if summary and summary.count else 0
 
     def review_count(self):
-        return self.community_posts.filter(is_approved=True).count()
+        """Nombre d'avis approuvés portant une note."""
+        summary = self.get_rating_summary()
+        return summary.count if summary else 0
+
+    def rating_histogram(self):
+        summary = self.get_rating_summary()
+        if summary:
+            return summary.histogram()
+        return [{'stars': stars, 'count': 0, 'percent': 0} for stars in range(5, 0, -1)]
 
     def get_default_variant_price(self):
         return self.default_variant.price if self.default_variant else self.price
@@ -154,7 +167,7 @@ class ProductVariant(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Prix (MAD)")
     is_default = models.BooleanField(default=False, verbose_name="Variante par défaut")
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Variante de produit"
@@ -187,11 +200,11 @@ class ProductVariant(models.Model):
                 super().save(*args, **kwargs)
 
             ProductVariant.objects.filter(
-                product=self.product
-            ).exclude(pk=self.pk).update(is_default=False)
+                product=self.product, is_default=True
+            ).exclude(pk=self.pk).update(is_default=False, updated_at=timezone.now())
 
             self.product.default_variant = self
-            self.product.save(update_fields=['default_variant'])
+            self.product.save(update_fields=['default_variant', 'updated_at'])
 
         super().save(*args, **kwargs)
 
@@ -205,3 +218,24 @@ class ProductVariant(models.Model):
             if new_default:
                 new_default.is_default = True
                 new_default.save()
+
+
+class CatalogTombstone(models.Model):
+    """Trace d'une suppression dans le catalogue, pour le flux de changements."""
+
+    KIND_CHOICES = [
+        ('category', 'Catégorie'),
+        ('product', 'Produit'),
+        ('variant', 'Variante'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Type")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID supprimé")
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Supprimé le")
+
+    class Meta:
+        verbose_name = "Suppression du catalogue"
+        verbose_name_plural = "Suppressions du catalogue"
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} supprimé le {self.deleted_at:%d/%m/%Y %H:%M}"
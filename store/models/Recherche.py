@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class SearchToken(models.Model):
+    """Entrée de l'index inversé : un terme normalisé et son poids pour un produit."""
+
+    product = models.ForeignKey(
+        'store.Product',
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        verbose_name="Produit"
+    )
+    token = models.CharField(max_length=64, verbose_name="Terme")
+    weight = models.PositiveIntegerField(default=1, verbose_name="Poids")
+
+    class Meta:
+        verbose_name = "Terme de recherche"
+        verbose_name_plural = "Termes de recherche"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'token'], name='unique_token_per_product')
+        ]
+        indexes = [
+            models.Index(fields=['token', 'product']),
+        ]
+
+    def __str__(self):
+        return f"{self.token} → {self.product_id} ({self.weight})"
@@ -0,0 +1,97 @@
+from django.db import models
+
+
+class CoPurchase(models.Model):
+    """Cellule de la matrice creuse de co-achat (triangle supérieur, ``product_a <= product_b``).
+
+    La diagonale (``product_a == product_b``) compte les commandes contenant
+    le produit, ce qui sert de support au calcul des scores.
+    """
+
+    product_a = models.ForeignKey(
+        'store.Product',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Produit A"
+    )
+    product_b = models.ForeignKey(
+        'store.Product',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Produit B"
+    )
+    orders = models.PositiveIntegerField(default=0, verbose_name="Commandes communes")
+
+    class Meta:
+        verbose_name = "Co-achat"
+        verbose_name_plural = "Co-achats"
+        constraints = [
+            models.UniqueConstraint(fields=['product_a', 'product_b'], name='unique_copurchase_pair')
+        ]
+        indexes = [
+            models.Index(fields=['product_b', 'product_a']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_a_id} × {self.product_b_id} : {self.orders}"
+
+
+class RelatedProduct(models.Model):
+    """Voisin précalculé « souvent achetés ensemble », classé par score décroissant."""
+
+    product = models.ForeignKey(
+        'store.Product',
+        on_delete=models.CASCADE,
+        related_name='bought_together',
+        verbose_name="Produit"
+    )
+    related = models.ForeignKey(
+        'store.Product',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Produit associé"
+    )
+    rank = models.PositiveSmallIntegerField(verbose_name="Rang")
+    score = models.FloatField(verbose_name="Score")
+    orders = models.PositiveIntegerField(default=0, verbose_name="Commandes communes")
+
+    class Meta:
+        verbose_name = "Produit associé"
+        verbose_name_plural = "Produits associés"
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='unique_related_product')
+        ]
+        indexes = [
+            models.Index(fields=['product', 'rank']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} → {self.related_id} (#{self.rank}, {self.score:.3f})"
+
+
+class ProductTrend(models.Model):
+    """Score de tendance d'un produit : ventes pondérées par une décroissance exponentielle.
+
+    Le score est exprimé relativement à ``store.trending.TREND_EPOCH`` : une
+    vente y compte pour ``quantité × 2^(âge depuis l'époque / demi-vie)``, et
+    le score stocké est le ``log2`` de la somme (borné), si bien qu'un simple
+    ``ORDER BY score DESC`` donne le classement courant.
+    """
+
+    product = models.OneToOneField(
+        'store.Product',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend',
+        verbose_name="Produit"
+    )
+    score = models.FloatField(default=0, db_index=True, verbose_name="Score")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Tendance produit"
+        verbose_name_plural = "Tendances produits"
+
+    def __str__(self):
+        return f"{self.product_id} : {self.score:.3g}"
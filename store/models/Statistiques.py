@@ -0,0 +1,33 @@
+from django.db import models
+
+
+class ProductViewCount(models.Model):
+    """Nombre de vues d'une fiche produit pour un jour donné.
+
+    Les produits très consultés sont répartis sur plusieurs ``shard`` pour que
+    les workers n'écrivent pas tous sur la même ligne ; le total d'une journée
+    est la somme de ses shards.
+    """
+
+    product = models.ForeignKey(
+        'store.Product',
+        on_delete=models.CASCADE,
+        related_name='view_counts',
+        verbose_name="Produit"
+    )
+    day = models.DateField(verbose_name="Jour")
+    shard = models.PositiveSmallIntegerField(default=0)
+    views = models.PositiveBigIntegerField(default=0, verbose_name="Vues")
+
+    class Meta:
+        verbose_name = "Vues produit"
+        verbose_name_plural = "Vues produits"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day', 'shard'], name='unique_product_view_shard')
+        ]
+        indexes = [
+            models.Index(fields=['day', 'product']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} le {self.day} : {self.views}"
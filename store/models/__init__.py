@@ -4,3 +4,6 @@ from .Panier import *
 from .Utilisateur import *
 from .Commands import *
 from .Config import *
+from .Recherche import *
+from .Recommandation import *
+from .Statistiques import *
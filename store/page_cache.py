@@ -0,0 +1,217 @@
+"""Cache des pages entières pour les visiteurs anonymes.
+
+Une page anonyme ne diffère d'un visiteur à l'autre que par le badge du
+panier et le jeton CSRF des formulaires. Pendant le rendu, le processeur de
+contexte ``cart_count`` écrit un marqueur à la place du nombre d'articles,
+et les jetons CSRF sont remplacés par un marqueur avant la mise en cache :
+le corps stocké est commun à tous. À chaque réponse, les marqueurs sont
+remplacés par le nombre d'articles du visiteur et par son propre jeton.
+
+La clé comprend le chemin, la chaîne de requête normalisée (paramètres
+vides et de suivi publicitaire retirés, ordre fixé), la langue et la
+génération du catalogue : toute modification du catalogue change les
+clés. L'espace de noms ``pages`` est en plus incrémenté quand un avis
+change. Les utilisateurs connectés, les requêtes autres que GET/HEAD et
+les pages portant des messages flash ne passent pas par le cache.
+
+Les variantes compressées (voir ``compression``) des pages sans jeton CSRF
+sont gardées en cache par nombre d'articles et par encodage.
+
+Chaque rendu est aussi gardé sous une clé indépendante de la génération
+(``last_good_key``), servie telle quelle quand la base est lente.
+"""
+import hashlib
+import logging
+import re
+import threading
+from functools import wraps
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import translation
+from django.utils.translation import get_language
+
+from . import compression, degradation
+from .caching import TieredCache
+from .catalog import get_catalog
+from .utils import get_cart_count
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_TIMEOUT = 300
+LAST_GOOD_TIMEOUT = 60 * 60 * 24
+REFRESH_LOCK_TIMEOUT = 60
+PAGE_LOCAL_ENTRIES = 64
+PAGE_NAMESPACE = 'pages'
+IGNORED_PARAMS = ('fbclid', 'gclid')
+IGNORED_PREFIXES = ('utm_',)
+
+CART_COUNT_PLACEHOLDER = '__cart_count__'
+CSRF_PLACEHOLDER = b'__csrf_token__'
+CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+# Instance dédiée : pages volumineuses, peu d'entrées gardées dans chaque worker
+pages = TieredCache(max_entries=PAGE_LOCAL_ENTRIES)
+
+
+def is_cacheable(request):
+    if request.method not in ('GET', 'HEAD') or getattr(request, 'prerendered', False):
+        return False
+    if request.user.is_authenticated:
+        return False
+    return not (request.COOKIES.get('messages') or request.session.get('_messages'))
+
+
+def normalized_query(query):
+    items = sorted(
+        (name, value)
+        for name, values in query.lists()
+        if name not in IGNORED_PARAMS and not name.startswith(IGNORED_PREFIXES)
+        for value in values
+        if value
+    )
+    return urlencode(items)
+
+
+def _page_hash(request):
+    raw = f'{get_language()}:{request.path}?{normalized_query(request.GET)}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def page_key(request):
+    return f'{get_catalog().generation}:{_page_hash(request)}'
+
+
+def last_good_key(request):
+    """Dernière version rendue de la page, toutes générations confondues (mode dégradé)."""
+    return f'last-good:{_page_hash(request)}'
+
+
+def bump_pages():
+    pages.bump(PAGE_NAMESPACE)
+
+
+def _fill(request, content, count):
+    content = content.replace(CART_COUNT_PLACEHOLDER.encode(), str(count).encode())
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+    return content
+
+
+def _serve(request, entry, state):
+    content, content_type, surrogate_keys = entry
+    request.surrogate_keys = set(surrogate_keys)
+    count = get_cart_count(request)
+    body = _fill(request, content, count)
+    response = HttpResponse(body, content_type=content_type)
+    response['X-Page-Cache'] = state
+    if state == 'stale':
+        response['Warning'] = '110 - "Response is Stale"'
+
+    encoding = compression.negotiate(request)
+    if encoding and CSRF_PLACEHOLDER not in content:
+        # Sans jeton CSRF, le corps ne dépend que du nombre d'articles : compressé une fois par valeur
+        variant_key = f'compressed:{hashlib.md5(content).hexdigest()}:{count}:{encoding}'
+        response.precompressed = (encoding, pages.get_or_set(
+            variant_key, lambda: compression.compress(body, encoding, cached=True), PAGE_CACHE_TIMEOUT,
+        ))
+    return response
+
+
+def _render(view, request, key, args, kwargs):
+    request.page_cache = True
+    response = view(request, *args, **kwargs)
+    request.page_cache = False
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return response
+    content = CSRF_INPUT.sub(rb'\1' + CSRF_PLACEHOLDER + rb'\2', response.content)
+    entry = (content, response['Content-Type'], sorted(getattr(request, 'surrogate_keys', ())))
+    pages.set(key, entry, PAGE_CACHE_TIMEOUT, namespace=PAGE_NAMESPACE)
+    pages.set(last_good_key(request), entry, LAST_GOOD_TIMEOUT)
+    response.content = _fill(request, content, get_cart_count(request))
+    response['X-Page-Cache'] = 'miss'
+    return response
+
+
+def _anonymous_copy(request):
+    """GET anonyme de la même URL que ``request`` : mêmes en-têtes, sans cookies."""
+    copy = HttpRequest()
+    copy.method = 'GET'
+    copy.path = request.path
+    copy.path_info = request.path_info
+    copy.META = {
+        name: value for name, value in request.META.items()
+        if isinstance(value, str) and name != 'HTTP_COOKIE' and not name.startswith('CSRF_')
+    }
+    copy.META['REQUEST_METHOD'] = 'GET'
+    copy.GET = request.GET.copy()
+    copy.user = AnonymousUser()
+    copy.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    copy.LANGUAGE_CODE = get_language()
+    copy.synthetic = True
+    return copy
+
+
+def _refresh_in_background(view, request, args, kwargs):
+    """Recalcule la page dans un thread, un seul à la fois par page et pour tous les workers."""
+    lock_key = f'refresh:{_page_hash(request)}'
+    if not pages.shared.add(lock_key, 1, REFRESH_LOCK_TIMEOUT):
+        return
+    url = request.get_full_path()
+    language = get_language()
+    # Copiée ici : la requête d'origine continue sa vie pendant le recalcul
+    background = _anonymous_copy(request)
+
+    def refresh():
+        try:
+            with translation.override(language):
+                _render(view, background, page_key(background), args, kwargs)
+        except Exception:
+            logger.exception("Échec du recalcul en arrière-plan de %s", url)
+        finally:
+            pages.shared.delete(lock_key)
+            connections.close_all()
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def anonymous_page_cache(on_hit=None):
+    """Sert la page depuis le cache aux visiteurs anonymes.
+
+    ``on_hit(request, *args, **kwargs)`` est appelé quand la vue n'est pas
+    exécutée (par exemple pour compter une vue produit). En mode dégradé
+    (voir ``degradation``), la dernière version connue est servie pendant
+    son recalcul, et les rendus sont plafonnés.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable(request):
+                if not degradation.is_degraded():
+                    return view(request, *args, **kwargs)
+                with degradation.render_slot() as admitted:
+                    return view(request, *args, **kwargs) if admitted else degradation.overloaded()
+
+            key = page_key(request)
+            entry = pages.get(key, namespace=PAGE_NAMESPACE)
+            if entry is not None:
+                if on_hit is not None:
+                    on_hit(request, *args, **kwargs)
+                return _serve(request, entry, 'hit')
+
+            if not degradation.is_degraded():
+                return _render(view, request, key, args, kwargs)
+
+            entry = pages.get(last_good_key(request))
+            if entry is not None:
+                _refresh_in_background(view, request, args, kwargs)
+                return _serve(request, entry, 'stale')
+            with degradation.render_slot() as admitted:
+                return _render(view, request, key, args, kwargs) if admitted else degradation.overloaded()
+        return wrapper
+    return decorator
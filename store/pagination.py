@@ -0,0 +1,128 @@
+"""Pagination par curseur (keyset) sur ``(created_at, id)``.
+
+Contrairement à ``Paginator``, aucune page ne fait de ``COUNT(*)`` ni
+d'``OFFSET`` : la page suivante est lue à partir de la dernière ligne vue,
+via l'index ``-created_at``. La page N coûte donc autant que la page 1.
+"""
+import hashlib
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import Q
+
+from .caching import tiered
+
+CURSOR_SALT = 'store.pagination'
+COUNT_CACHE_TIMEOUT = 300
+
+
+def estimated_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """``COUNT(*)`` mis en cache par requête SQL : au plus un comptage par période."""
+    sql = str(queryset.order_by().query)
+    key = 'count:' + hashlib.md5(sql.encode()).hexdigest()
+    return tiered.get_or_set(key, queryset.count, timeout)
+
+
+class CursorPage:
+    def __init__(self, object_list, has_next, has_previous, paginator):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.paginator = paginator
+        self.next_query = ''
+        self.previous_query = ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        if self.has_next:
+            return self.paginator.encode(self.object_list[-1], forward=True)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous:
+            return self.paginator.encode(self.object_list[0], forward=False)
+        return None
+
+    def build_queries(self, query, param):
+        """Prépare ``next_query``/``previous_query`` en conservant les autres filtres."""
+        for attr, cursor in (('next_query', self.next_cursor), ('previous_query', self.previous_cursor)):
+            if cursor:
+                params = query.copy()
+                params[param] = cursor
+                setattr(self, attr, params.urlencode())
+
+
+class CursorPaginator:
+    """Pagine un queryset trié par ``field`` décroissant puis par ``id``.
+
+    Le queryset peut aussi renvoyer des dictionnaires (``values()``), qui
+    doivent alors contenir ``field`` et ``id``.
+    """
+
+    def __init__(self, queryset, per_page, field='created_at'):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.field = field
+
+    def encode(self, obj, forward):
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        return signing.dumps(
+            [value.isoformat(), pk, 'n' if forward else 'p'],
+            salt=CURSOR_SALT, compress=True,
+        )
+
+    def decode(self, cursor):
+        try:
+            value, pk, direction = signing.loads(cursor, salt=CURSOR_SALT)
+            return datetime.fromisoformat(value), int(pk), direction == 'n'
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+
+    def page(self, cursor=None):
+        position = self.decode(cursor) if cursor else None
+        queryset = self.queryset
+        field = self.field
+
+        if position is None:
+            rows = list(queryset.order_by(f'-{field}', '-pk')[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], len(rows) > self.per_page, False, self)
+
+        value, pk, forward = position
+        if forward:
+            rows = list(
+                queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+                .order_by(f'-{field}', '-pk')[:self.per_page + 1]
+            )
+            return CursorPage(rows[:self.per_page], len(rows) > self.per_page, True, self)
+
+        rows = list(
+            queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            .order_by(field, 'pk')[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, True, has_previous, self)
+
+    def get_page(self, request, param='page'):
+        """Page demandée par ``request.GET[param]`` ; un curseur invalide renvoie la première page."""
+        page = self.page(request.GET.get(param))
+        page.build_queries(request.GET, param)
+        return page
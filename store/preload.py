@@ -0,0 +1,61 @@
+"""Préchargement des ressources critiques (en-têtes ``Link`` et 103 Early Hints).
+
+``PRELOAD_ASSETS`` liste les feuilles de style, scripts et images bloquants
+de ``base.html``. Toutes les pages du site l'étendent, et aucun gabarit
+n'ajoute de ressource statique qui lui soit propre : la même liste est
+annoncée pour toute réponse HTML.
+
+* ``store.middlewares.PreloadMiddleware`` ajoute l'en-tête
+  ``Link: <…>; rel=preload`` aux réponses HTML (un CDN ou nginx peut en
+  tirer une réponse 103) ;
+* ``EarlyHintsMiddleware`` enveloppe l'application ASGI et envoie une
+  réponse 103 avec les ressources de ``base.html`` avant même l'exécution
+  de la vue, si le serveur annonce l'extension ``http.response.early_hint``.
+"""
+import re
+from functools import lru_cache
+
+from django.templatetags.static import static
+
+# (chemin statique ou URL absolue, type de ressource)
+PRELOAD_ASSETS = (
+    ('js/taillwindcss.js', 'script'),
+    ('css/main.css', 'style'),
+    ('https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css', 'style'),
+    ('https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/bootstrap-icons.css', 'style'),
+    ('https://cdn.jsdelivr.net/npm/alpinejs@3.x.x/dist/cdn.min.js', 'script'),
+    ('img/logo2.png', 'image'),
+)
+
+# Réponses sans page HTML : ni indications précoces ni préchargement
+SKIPPED_PATHS = re.compile(r'^/(static|media)/|^/[a-z]{2}/api/')
+
+
+@lru_cache(maxsize=None)
+def links():
+    """Valeurs ``Link`` des ressources de ``base.html``."""
+    values = []
+    for path, kind in PRELOAD_ASSETS:
+        url = path if '://' in path else static(path)
+        values.append(f'<{url}>; rel=preload; as={kind}')
+    return tuple(values)
+
+
+class EarlyHintsMiddleware:
+    """Enveloppe ASGI : 103 Early Hints envoyée avant que Django ne traite la requête."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] == 'http'
+            and scope['method'] in ('GET', 'HEAD')
+            and 'http.response.early_hint' in scope.get('extensions', {})
+            and not SKIPPED_PATHS.match(scope['path'])
+        ):
+            await send({
+                'type': 'http.response.early_hint',
+                'links': [link.encode() for link in links()],
+            })
+        await self.app(scope, receive, send)
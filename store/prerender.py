@@ -0,0 +1,173 @@
+"""Pré-rendu statique des pages publiques du catalogue.
+
+L'accueil, « À propos », « Contact », les pages de catégorie et les fiches
+produit sont identiques pour tous les visiteurs anonymes, au badge du
+panier près. Elles sont rendues pour chaque langue de ``LANGUAGES`` dans
+``settings.PRERENDER_ROOT`` sous la forme ``<chemin de l'URL>/index.html``
+(``fr/produit/12/index.html``), que nginx sert directement
+(``try_files /pages$uri/index.html @django``) aux requêtes sans chaîne de
+requête ni cookie de session : les visiteurs connectés voient leur menu,
+ils passent par Django. Le rendu se fait sans session ni panier ;
+``js/prerender.js`` complète la page chez le visiteur : badge du panier
+(cookie ``cart_count``), jeton CSRF des formulaires, vue produit.
+
+Les signaux suppriment les pages touchées par une modification de
+``Product``, ``Category`` ou ``CommunityPost`` (nginx retombe alors sur
+Django) ; ``prerender_pages --missing`` ne régénère que celles-ci.
+"""
+import os
+import tempfile
+from importlib import import_module
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import translation
+
+from .catalog import get_catalog
+from .models import Product, RelatedProduct
+
+INDEX_FILE = 'index.html'
+# Pages qui ne dépendent d'aucun objet, régénérées par un rendu complet
+FIXED_PAGES = ('about', 'contact')
+
+
+def languages():
+    return [code for code, _ in settings.LANGUAGES]
+
+
+def root():
+    return Path(settings.PRERENDER_ROOT)
+
+
+def page_file(url):
+    return root() / url.strip('/') / INDEX_FILE
+
+
+def localized_urls(name, **kwargs):
+    """URL de la page ``name`` dans chaque langue."""
+    urls = []
+    for language in languages():
+        with translation.override(language):
+            urls.append(reverse(name, kwargs=kwargs or None))
+    return urls
+
+
+# -------------------- inventaire --------------------
+def category_urls(category_ids):
+    return [url for pk in category_ids for url in localized_urls('category_products', category_id=pk)]
+
+
+def product_urls(product_ids):
+    return [url for pk in product_ids for url in localized_urls('product_detail', pk=pk)]
+
+
+def all_urls(catalog=None):
+    catalog = catalog or get_catalog()
+    urls = localized_urls('home')
+    for name in FIXED_PAGES:
+        urls += localized_urls(name)
+    urls += category_urls(c.id for c in catalog.categories)
+    urls += product_urls(p.id for p in catalog.product_list)
+    return urls
+
+
+# -------------------- rendu --------------------
+def _request(url, language):
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request.LANGUAGE_CODE = language
+    request.prerendered = request.synthetic = True
+    return request
+
+
+def render_page(url):
+    """HTML de ``url`` pour un visiteur anonyme, ou ``None`` si la page n'existe plus."""
+    language = url.strip('/').split('/', 1)[0]
+    with translation.override(language):
+        match = resolve(url)
+        response = match.func(_request(url, language), *match.args, **match.kwargs)
+    if response.status_code != 200:
+        return None
+    return response.content
+
+
+def write_page(url, content):
+    path = page_file(url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.index-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def remove_page(url):
+    try:
+        page_file(url).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def build(urls):
+    """Rend et écrit ``urls`` ; renvoie le nombre de pages écrites."""
+    written = 0
+    for url in urls:
+        content = render_page(url)
+        if content is None:
+            remove_page(url)
+            continue
+        write_page(url, content)
+        written += 1
+    return written
+
+
+def build_all():
+    """Rend toutes les pages et supprime celles qui ne correspondent plus à rien."""
+    urls = all_urls()
+    written = build(urls)
+    expected = {page_file(url) for url in urls}
+    for path in root().rglob(INDEX_FILE):
+        if path not in expected:
+            path.unlink()
+    return written
+
+
+def build_missing():
+    """Rend les pages supprimées par les signaux ; l'accueil (meilleures ventes) est toujours rendu."""
+    home = localized_urls('home')
+    urls = home + [url for url in all_urls() if url not in home and not page_file(url).exists()]
+    return build(urls)
+
+
+# -------------------- invalidation --------------------
+def discard(urls):
+    """Supprime les pages ``urls`` une fois la transaction validée."""
+    urls = list(urls)
+    if urls:
+        transaction.on_commit(lambda: [remove_page(url) for url in urls])
+
+
+def listing_urls():
+    """Accueil et pages de catégorie : leurs comptages et facettes couvrent tout le catalogue."""
+    return localized_urls('home') + category_urls(c.id for c in get_catalog().categories)
+
+
+def discard_product(product_id, category_id):
+    # Fiches qui affichent ce produit parmi les produits similaires
+    neighbours = set(RelatedProduct.objects.filter(related_id=product_id).values_list('product_id', flat=True))
+    neighbours.update(Product.objects.filter(category_id=category_id).values_list('pk', flat=True))
+    neighbours.add(product_id)
+    discard(listing_urls() + category_urls([category_id] if category_id else []) + product_urls(neighbours))
+
+
+def discard_category(category_id, product_ids):
+    discard(listing_urls() + category_urls([category_id]) + product_urls(product_ids))
+
+
+def discard_reviews(product_id):
+    discard(listing_urls() + product_urls([product_id]))
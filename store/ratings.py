@@ -0,0 +1,132 @@
+"""Maintenance incrémentale des agrégats de notes (``ProductRating``).
+
+Chaque création, modification, (dés)approbation ou suppression d'un avis se
+traduit par un delta ``{note: ±n}`` appliqué en un seul UPDATE, sans
+ré-agréger ``community_posts``. Les agrégats étant servis par l'instantané
+du catalogue, chaque changement en publie une nouvelle génération ; il
+invalide aussi les cubes de facettes, dont le filtre par note lit
+``rating_summary__average``.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+from . import catalog, facets
+from .models import CommunityPost, Product, ProductRating
+
+STARS = range(1, 6)
+
+
+def _publish():
+    """Nouvelle génération du catalogue et nouveaux comptages, après validation."""
+    catalog.invalidate()
+    transaction.on_commit(facets.bump_version)
+
+
+def review_state(post):
+    """Contribution d'un avis aux agrégats : ``(product_id, note)`` ou None."""
+    if post is None or not post.is_approved or not post.rating:
+        return None
+    return post.product_id, post.rating
+
+
+def apply_delta(product_id, stars):
+    """Applique ``stars`` (``{note: ±n}``) aux agrégats d'un produit."""
+    stars = {rating: n for rating, n in stars.items() if n and rating in STARS}
+    if not stars:
+        return
+    count = sum(stars.values())
+    total = sum(rating * n for rating, n in stars.items())
+
+    # ``average`` en premier : MySQL évalue le SET de gauche à droite
+    updates = {
+        'average': Case(
+            When(count__lte=-count, then=Value(0.0)),
+            default=Cast(F('total') + total, FloatField()) / (F('count') + count),
+            output_field=FloatField(),
+        ),
+        'count': F('count') + count,
+        'total': F('total') + total,
+    }
+    for rating, n in stars.items():
+        updates[f'stars_{rating}'] = F(f'stars_{rating}') + n
+
+    updated = ProductRating.objects.filter(product_id=product_id).update(**updates)
+    if not updated and count > 0:
+        ProductRating.objects.get_or_create(product_id=product_id)
+        ProductRating.objects.filter(product_id=product_id).update(**updates)
+
+
+def apply_change(before, after):
+    """Met à jour les agrégats entre deux états renvoyés par ``review_state``."""
+    if before == after:
+        return
+    deltas = defaultdict(lambda: defaultdict(int))
+    if before:
+        deltas[before[0]][before[1]] -= 1
+    if after:
+        deltas[after[0]][after[1]] += 1
+    for product_id, stars in deltas.items():
+        apply_delta(product_id, stars)
+    _publish()
+
+
+def set_approval(queryset, approved):
+    """Équivalent de ``queryset.update(is_approved=...)`` qui tient les agrégats à jour."""
+    sign = 1 if approved else -1
+    with transaction.atomic():
+        changing = (
+            queryset.exclude(is_approved=approved)
+            .values('product_id', 'rating')
+            .annotate(n=Count('pk'))
+            .order_by()
+        )
+        deltas = defaultdict(dict)
+        for row in changing:
+            deltas[row['product_id']][row['rating']] = sign * row['n']
+        updated = queryset.update(is_approved=approved)
+        for product_id, stars in deltas.items():
+            apply_delta(product_id, stars)
+        if deltas:
+            _publish()
+    return updated
+
+
+def compute_summaries():
+    """Agrégats de tous les produits en une seule requête groupée."""
+    rows = (
+        CommunityPost.objects.filter(is_approved=True, rating__in=STARS)
+        .values('product_id', 'rating')
+        .annotate(n=Count('pk'))
+        .order_by()
+    )
+    summaries = defaultdict(dict)
+    for row in rows:
+        summaries[row['product_id']][row['rating']] = row['n']
+    return summaries
+
+
+def build_rating(product_id, stars):
+    count = sum(stars.values())
+    total = sum(rating * n for rating, n in stars.items())
+    return ProductRating(
+        product_id=product_id,
+        average=total / count if count else 0,
+        count=count,
+        total=total,
+        **{f'stars_{rating}': stars.get(rating, 0) for rating in STARS},
+    )
+
+
+def reconcile(batch_size=1000):
+    """Reconstruit ``ProductRating`` pour tous les produits ; retourne leur nombre."""
+    summaries = compute_summaries()
+    product_ids = Product.objects.values_list('pk', flat=True).order_by('pk')
+    ratings = [build_rating(pk, summaries.get(pk, {})) for pk in product_ids]
+    with transaction.atomic():
+        ProductRating.objects.all().delete()
+        ProductRating.objects.bulk_create(ratings, batch_size=batch_size)
+        _publish()
+    return len(ratings)
@@ -0,0 +1,209 @@
+"""Produits « souvent achetés ensemble », calculés à partir des commandes.
+
+Les lignes de commande sont lues en une requête triée par commande et
+regroupées en paniers ; chaque panier incrémente les cellules d'une matrice
+creuse de co-achat (``CoPurchase``, triangle supérieur, la diagonale comptant
+les commandes par produit). Les paires sont ensuite notées (cosinus ou lift)
+et les ``TOP_K`` meilleurs voisins de chaque produit sont écrits dans
+``RelatedProduct``, lu en une requête par ``product_detail``.
+
+Le mode incrémental ne lit que les commandes postérieures au point de
+reprise et ne recalcule que les produits dont un score a pu changer. Le
+lift dépend du nombre total de commandes : avec cette métrique, chaque
+passage reclasse donc tous les produits à partir de la matrice à jour. Une
+commande annulée après coup reste comptée jusqu'à la prochaine
+reconstruction complète (``--full``).
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .models import BatchCheckpoint, CoPurchase, Order, OrderItem, RelatedProduct
+
+CHECKPOINT = 'recommendations'
+TOP_K = 8
+METRICS = ('cosine', 'lift')
+DEFAULT_METRIC = 'cosine'
+BATCH_SIZE = 1000
+# Les lignes d'une commande sont créées après la commande elle-même :
+# on laisse ce délai avant de la considérer comme complète.
+SETTLE_DELAY = timedelta(minutes=5)
+
+
+def counted_orders():
+    return Order.objects.filter(is_deleted=False).exclude(status='cancelled')
+
+
+def baskets(orders):
+    """Ensemble des produits de chaque commande de ``orders``."""
+    rows = (
+        OrderItem.objects.filter(order__in=orders)
+        .values_list('order_id', 'variant__product_id')
+        .order_by('order_id')
+        .iterator(chunk_size=5000)
+    )
+    for _, items in groupby(rows, key=itemgetter(0)):
+        yield {product_id for _, product_id in items}
+
+
+def count_pairs(baskets):
+    """Cellules ``(a, b) → commandes`` avec ``a <= b`` pour une suite de paniers."""
+    counts = Counter()
+    for basket in baskets:
+        products = sorted(basket)
+        for product_id in products:
+            counts[(product_id, product_id)] += 1
+        counts.update(combinations(products, 2))
+    return counts
+
+
+def score(orders, support_a, support_b, total, metric=DEFAULT_METRIC):
+    if not support_a or not support_b:
+        return 0.0
+    if metric == 'lift':
+        return orders * total / (support_a * support_b)
+    return orders / math.sqrt(support_a * support_b)
+
+
+def top_neighbours(cells, support, total, products=None, top_k=TOP_K, metric=DEFAULT_METRIC):
+    """``{produit: [(score, voisin, commandes), ...]}`` limité à ``top_k`` par produit."""
+    candidates = defaultdict(list)
+    for (a, b), orders in cells.items():
+        if a == b or not orders:
+            continue
+        value = score(orders, support.get(a), support.get(b), total, metric)
+        if products is None or a in products:
+            candidates[a].append((value, orders, -b))
+        if products is None or b in products:
+            candidates[b].append((value, orders, -a))
+    return {
+        product_id: [(value, -other, orders) for value, orders, other in heapq.nlargest(top_k, entries)]
+        for product_id, entries in candidates.items()
+    }
+
+
+def _save_neighbours(products, neighbours):
+    RelatedProduct.objects.filter(product_id__in=products).delete()
+    RelatedProduct.objects.bulk_create(
+        [
+            RelatedProduct(product_id=product_id, related_id=other, rank=rank, score=value, orders=orders)
+            for product_id, entries in neighbours.items()
+            for rank, (value, other, orders) in enumerate(entries, start=1)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def _cutoff():
+    return (
+        counted_orders()
+        .filter(created_at__lte=timezone.now() - SETTLE_DELAY)
+        .aggregate(last=Max('id'))['last']
+    )
+
+
+@transaction.atomic
+def rebuild(top_k=TOP_K, metric=DEFAULT_METRIC):
+    """Recalcule toute la matrice et tous les voisins. Renvoie le nombre de commandes lues."""
+    last = _cutoff() or 0
+    orders = counted_orders().filter(id__lte=last)
+    cells = count_pairs(baskets(orders))
+    support = {a: n for (a, b), n in cells.items() if a == b}
+    total = orders.count()
+
+    CoPurchase.objects.all().delete()
+    CoPurchase.objects.bulk_create(
+        [CoPurchase(product_a_id=a, product_b_id=b, orders=n) for (a, b), n in cells.items()],
+        batch_size=BATCH_SIZE,
+    )
+    RelatedProduct.objects.all().delete()
+    _save_neighbours([], top_neighbours(cells, support, total, top_k=top_k, metric=metric))
+    BatchCheckpoint.set(CHECKPOINT, last)
+    return total
+
+
+def _rerank_all(last, top_k, metric):
+    cells = {
+        (a, b): n
+        for a, b, n in CoPurchase.objects.values_list('product_a_id', 'product_b_id', 'orders').iterator(
+            chunk_size=5000
+        )
+    }
+    support = {a: n for (a, b), n in cells.items() if a == b}
+    total = counted_orders().filter(id__lte=last).count()
+    RelatedProduct.objects.all().delete()
+    _save_neighbours([], top_neighbours(cells, support, total, top_k=top_k, metric=metric))
+
+
+@transaction.atomic
+def update(top_k=TOP_K, metric=DEFAULT_METRIC):
+    """Intègre les commandes arrivées depuis le dernier passage. Renvoie leur nombre."""
+    since = BatchCheckpoint.get(CHECKPOINT)
+    last = _cutoff() or 0
+    if last <= since:
+        return 0
+    new_orders = counted_orders().filter(id__gt=since, id__lte=last)
+    delta = count_pairs(baskets(new_orders))
+    if delta:
+        touched = {a for a, _ in delta} | {b for _, b in delta}
+        existing = {
+            (cell.product_a_id, cell.product_b_id): cell
+            for cell in CoPurchase.objects.filter(product_a_id__in=touched, product_b_id__in=touched)
+        }
+        changed, created = [], []
+        for key, n in delta.items():
+            cell = existing.get(key)
+            if cell is None:
+                created.append(CoPurchase(product_a_id=key[0], product_b_id=key[1], orders=n))
+            else:
+                cell.orders += n
+                changed.append(cell)
+        CoPurchase.objects.bulk_update(changed, ['orders'], batch_size=BATCH_SIZE)
+        CoPurchase.objects.bulk_create(created, batch_size=BATCH_SIZE)
+
+    if metric == 'lift':
+        # Le total change à chaque commande, donc tous les scores aussi
+        _rerank_all(last, top_k, metric)
+    elif delta:
+        # Produits touchés et leurs partenaires : leur score dépend du support modifié
+        rows = CoPurchase.objects.filter(Q(product_a_id__in=touched) | Q(product_b_id__in=touched))
+        affected = set(touched)
+        for a, b in rows.values_list('product_a_id', 'product_b_id'):
+            affected.update((a, b))
+        cells = {
+            (a, b): n
+            for a, b, n in CoPurchase.objects.filter(
+                Q(product_a_id__in=affected) | Q(product_b_id__in=affected)
+            ).values_list('product_a_id', 'product_b_id', 'orders')
+        }
+        partners = {a for a, _ in cells} | {b for _, b in cells}
+        support = dict(
+            CoPurchase.objects.filter(product_a_id__in=partners, product_b_id=F('product_a_id'))
+            .values_list('product_a_id', 'orders')
+        )
+        total = counted_orders().filter(id__lte=last).count()
+        neighbours = top_neighbours(cells, support, total, products=affected, top_k=top_k, metric=metric)
+        _save_neighbours(affected, neighbours)
+    BatchCheckpoint.set(CHECKPOINT, last)
+    return new_orders.count()
+
+
+def bought_together(catalog, product, limit=4):
+    """Voisins précalculés de ``product`` complétés par la même catégorie si besoin."""
+    ids = list(
+        RelatedProduct.objects.filter(product_id=product.id)
+        .order_by('rank')
+        .values_list('related_id', flat=True)[:limit]
+    )
+    products = catalog.resolve(ids)
+    if len(products) < limit:
+        seen = {p.id for p in products}
+        products += [p for p in catalog.related(product, limit + len(seen)) if p.id not in seen]
+    return products[:limit]
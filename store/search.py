@@ -0,0 +1,188 @@
+"""Index inversé des produits (français / arabe).
+
+Chaque produit est découpé en termes normalisés stockés dans ``SearchToken``.
+Une recherche devient une lecture indexée sur ``token`` suivie d'un
+regroupement par produit, au lieu d'un ``icontains`` sur toutes les descriptions.
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, Value, When
+
+from .models import Product, SearchToken
+
+# Poids de chaque champ dans le score final
+FIELD_WEIGHTS = (
+    ('name', 5),
+    ('name_ar', 5),
+    ('ingredients', 2),
+    ('description', 1),
+    ('description_ar', 1),
+)
+INDEXED_FIELDS = {field for field, _ in FIELD_WEIGHTS}
+
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+MAX_RESULTS = 500
+
+FRENCH_STOPWORDS = {
+    'le', 'la', 'les', 'de', 'des', 'du', 'un', 'une', 'et', 'ou', 'en',
+    'au', 'aux', 'a', 'l', 'd', 'pour', 'avec', 'sans', 'sur', 'par', 'est',
+}
+
+# Tashkeel (harakat, tanwin, shadda, sukun, alef suscrit) et tatweel
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+ARABIC_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+})
+ARABIC_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+ARABIC_CHAR = re.compile('[\u0600-\u06ff]')
+TOKEN_SPLIT = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def _fold_latin(text):
+    """Supprime les accents français (é → e, ç → c, œ → oe)."""
+    text = text.replace('œ', 'oe').replace('æ', 'ae')
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem_french(word):
+    """Racinisation légère : pluriels et féminin en -e."""
+    if len(word) > 4 and word.endswith('aux'):
+        return word[:-3] + 'al'
+    if len(word) > 3 and word[-1] in 'sx':
+        word = word[:-1]
+    if len(word) > 4 and word.endswith('e'):
+        word = word[:-1]
+    return word
+
+
+def _stem_arabic(word):
+    for prefix in ARABIC_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            return word[len(prefix):]
+    return word
+
+
+def normalize(text):
+    """Normalise un texte libre et le découpe en termes indexables."""
+    if not text:
+        return []
+    text = ARABIC_DIACRITICS.sub('', text.lower()).translate(ARABIC_FOLDING)
+    tokens = []
+    for word in TOKEN_SPLIT.split(text):
+        word = word.strip('_')
+        if not word:
+            continue
+        if ARABIC_CHAR.search(word):
+            word = _stem_arabic(word)
+        else:
+            word = _fold_latin(word)
+            if word in FRENCH_STOPWORDS:
+                continue
+            word = _stem_french(word)
+        if word:
+            tokens.append(word[:MAX_TOKEN_LENGTH])
+    return tokens
+
+
+def product_tokens(product):
+    """Retourne ``{terme: poids}`` pour un produit."""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS:
+        for token in normalize(getattr(product, field, '')):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+def index_product(product):
+    """Met à jour l'index d'un produit en n'écrivant que les termes modifiés."""
+    wanted = product_tokens(product)
+    existing = dict(
+        SearchToken.objects.filter(product=product).values_list('token', 'weight')
+    )
+
+    removed = [token for token in existing if token not in wanted]
+    changed = {token: weight for token, weight in wanted.items()
+               if token in existing and existing[token] != weight}
+    added = [SearchToken(product=product, token=token, weight=weight)
+             for token, weight in wanted.items() if token not in existing]
+
+    with transaction.atomic():
+        if removed:
+            SearchToken.objects.filter(product=product, token__in=removed).delete()
+        for token, weight in changed.items():
+            SearchToken.objects.filter(product=product, token=token).update(weight=weight)
+        if added:
+            SearchToken.objects.bulk_create(added)
+
+
+def rebuild_index(batch_size=500):
+    """Reconstruit tout l'index ; retourne le nombre de produits indexés."""
+    fields = ['id'] + [field for field, _ in FIELD_WEIGHTS]
+    count = 0
+    with transaction.atomic():
+        SearchToken.objects.all().delete()
+        batch = []
+        for product in Product.objects.only(*fields).iterator(chunk_size=batch_size):
+            batch.extend(
+                SearchToken(product_id=product.id, token=token, weight=weight)
+                for token, weight in product_tokens(product).items()
+            )
+            count += 1
+            if len(batch) >= batch_size:
+                SearchToken.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            SearchToken.objects.bulk_create(batch)
+    return count
+
+
+def search_product_ids(query, limit=MAX_RESULTS):
+    """IDs des produits contenant tous les termes de ``query``, triés par pertinence.
+
+    Le dernier terme est traité comme un préfixe pour la recherche à la frappe.
+    """
+    terms = list(dict.fromkeys(normalize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    *exact, prefix = terms
+    conditions = [Q(token=term) for term in exact] + [Q(token__startswith=prefix)]
+    match = Q()
+    for condition in conditions:
+        match |= condition
+
+    # Un indicateur par terme : un même jeton peut satisfaire un terme exact et le préfixe
+    hits = {
+        f'term_{i}': Max(Case(When(condition, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for i, condition in enumerate(conditions)
+    }
+    rows = (
+        SearchToken.objects.filter(match)
+        .values('product_id')
+        .annotate(score=Sum('weight'), **hits)
+        .filter(**{name: 1 for name in hits})
+        .order_by('-score', '-product_id')
+        .values_list('product_id', flat=True)[:limit]
+    )
+    return list(rows)
+
+
+def order_by_ids(queryset, ids):
+    """Restreint ``queryset`` à ``ids`` en conservant leur ordre."""
+    if not ids:
+        return queryset.none()
+    ranking = Case(*[When(pk=pk, then=Value(pos)) for pos, pk in enumerate(ids)],
+                   output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(ranking)
+
+
+def search_products(queryset, query):
+    """Applique une recherche classée à un queryset de ``Product``."""
+    return order_by_ids(queryset, search_product_ids(query))
@@ -1,18 +1,35 @@
 import os
 from django.db.models.signals import pre_save, post_save, post_delete
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db import transaction
 from django.dispatch import receiver
+from django.utils import timezone
+from django.contrib.auth.signals import user_logged_in
 from django.contrib.sessions.models import Session
-from store.models import Cart, Product, ProductImage, Order, CommunityPost, ProductVariant
+from store.models import (
+    Cart, CatalogTombstone, Category, Product, ProductImage, Order, OrderItem, CommunityPost, ProductVariant
+)
 from .telegram import send_telegram_message
+from . import catalog, degradation, facets, fragments, http_cache, page_cache, prerender, ratings, search, trending, view_counts
+from .listing import listing_index
+from .utils import CART_COUNT_SESSION_KEY
 
 
-# 🛒 Supprimer les paniers anonymes lorsque la session est supprimée
+# 🛒 Supprimer les paniers anonymes d'avant le cookie (voir cookie_cart) lorsque la session est supprimée
 @receiver(post_delete, sender=Session)
 def delete_anonymous_carts(sender, instance, **kwargs):
     if instance.session_key:
         Cart.objects.filter(session_key=instance.session_key, user__isnull=True).delete()
 
 
+# 🛒 Le nombre d'articles gardé en session est celui de l'utilisateur : recalculé après connexion
+@receiver(user_logged_in)
+def forget_cart_count(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        request.session.pop(CART_COUNT_SESSION_KEY, None)
+
+
 # 📦 Notifier quand une commande est créée
 @receiver(post_save, sender=Order)
 def notify_order_created(sender, instance, created, **kwargs):
@@ -85,6 +102,192 @@ def update_default_variant(sender, instance, **kwargs):
     if instance.is_default:
         ProductVariant.objects.filter(
             product=instance.product
-        ).exclude(pk=instance.pk).update(is_default=False)
+        ).exclude(pk=instance.pk).update(is_default=False, updated_at=timezone.now())
         instance.product.default_variant = instance
         instance.product.save(update_fields=['default_variant'])
+
+
+# 🔎 Mettre à jour l'index de recherche d'un produit
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not search.INDEXED_FIELDS.intersection(update_fields):
+        return
+    search.index_product(instance)
+
+
+# ⭐ Maintenir les agrégats de notes lors de la modification d'un avis
+@receiver(pre_save, sender=CommunityPost)
+def remember_review_rating_state(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = CommunityPost.objects.filter(pk=instance.pk).only(
+            'product_id', 'rating', 'is_approved'
+        ).first()
+    instance._rating_state = ratings.review_state(previous)
+
+
+@receiver(post_save, sender=CommunityPost)
+def update_product_rating_on_save(sender, instance, **kwargs):
+    before = getattr(instance, '_rating_state', None)
+    after = ratings.review_state(instance)
+    ratings.apply_change(before, after)
+    instance._rating_state = after
+    if before != after:
+        for state in {before, after} - {None}:
+            listing_index.refresh_product(state[0])
+
+
+@receiver(post_delete, sender=CommunityPost)
+def update_product_rating_on_delete(sender, instance, **kwargs):
+    state = ratings.review_state(instance)
+    ratings.apply_change(state, None)
+    if state:
+        listing_index.refresh_product(state[0])
+
+
+# 🧮 Invalider les comptages de facettes quand le catalogue change
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_facet_counts(sender, **kwargs):
+    facets.bump_version()
+
+
+# 🗂️ Tenir à jour l'index de tri du catalogue
+@receiver(post_save, sender=Product)
+def refresh_listing_on_product_save(sender, instance, **kwargs):
+    listing_index.refresh_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def refresh_listing_on_product_delete(sender, instance, **kwargs):
+    listing_index.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def refresh_listing_on_variant_change(sender, instance, **kwargs):
+    listing_index.refresh_product(instance.product_id)
+
+
+# 📸 Publier une nouvelle génération de l'instantané du catalogue
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_snapshot(sender, **kwargs):
+    catalog.invalidate()
+
+
+# 🔥 Ajouter chaque vente au score de tendance du produit
+@receiver(post_save, sender=OrderItem)
+def record_trending_sale(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        trending.record_sale(instance.variant.product_id, instance.quantity, instance.order.created_at)
+
+
+# 👁️ Écrire les vues produit en attente une fois la réponse envoyée
+@receiver(request_finished)
+def flush_product_views(sender, **kwargs):
+    view_counts.flush_if_due()
+
+
+# 🪦 Garder une trace des suppressions pour le flux de changements du catalogue
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductVariant)
+def record_catalog_tombstone(sender, instance, **kwargs):
+    kind = {Category: 'category', Product: 'product', ProductVariant: 'variant'}[sender]
+    CatalogTombstone.objects.create(kind=kind, object_id=instance.pk)
+
+
+# 🃏 Invalider les cartes produit pré-rendues
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_product_card(sender, instance, **kwargs):
+    fragments.bump_cards(instance.pk)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def bump_product_card_for_related(sender, instance, **kwargs):
+    fragments.bump_cards(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+def bump_category_product_cards(sender, instance, **kwargs):
+    fragments.bump_cards(*instance.products.values_list('pk', flat=True))
+
+
+# 🧹 Purger les pages en cache du proxy inverse
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def purge_product_pages(sender, instance, **kwargs):
+    http_cache.purge(f'product-{instance.pk}', f'category-{instance.category_id}', 'listing', 'home')
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def purge_product_pages_for_related(sender, instance, **kwargs):
+    http_cache.purge(f'product-{instance.product_id}', 'listing')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category_pages(sender, instance, **kwargs):
+    http_cache.purge(f'category-{instance.pk}', 'listing')
+
+
+@receiver(post_save, sender=CommunityPost)
+@receiver(post_delete, sender=CommunityPost)
+def purge_review_pages(sender, instance, **kwargs):
+    transaction.on_commit(http_cache.bump_reviews)
+    transaction.on_commit(page_cache.bump_pages)
+    http_cache.purge(f'reviews-{instance.product_id}', 'reviews', 'listing')
+
+
+# 📄 Supprimer les pages pré-rendues touchées (prerender_pages --missing les régénère)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def discard_prerendered_product(sender, instance, **kwargs):
+    prerender.discard_product(instance.pk, instance.category_id)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def discard_prerendered_product_for_related(sender, instance, **kwargs):
+    product = Product.objects.filter(pk=instance.product_id).only('category_id').first()
+    if product is not None:
+        prerender.discard_product(product.pk, product.category_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def discard_prerendered_category(sender, instance, **kwargs):
+    prerender.discard_category(instance.pk, list(instance.products.values_list('pk', flat=True)))
+
+
+@receiver(post_save, sender=CommunityPost)
+@receiver(post_delete, sender=CommunityPost)
+def discard_prerendered_reviews(sender, instance, **kwargs):
+    prerender.discard_reviews(instance.product_id)
+
+
+# 🐢 Chronométrer les requêtes SQL pour détecter une base lente
+@receiver(connection_created)
+def time_database_queries(sender, connection, **kwargs):
+    if degradation.timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(degradation.timed_execute)
@@ -0,0 +1,213 @@
+"""Rendu de gabarits en flux (``StreamingHttpResponse``).
+
+``stream_render`` remplace ``render`` dans les vues qui le choisissent :
+le gabarit est rendu nœud par nœud et envoyé au fil de l'eau. Le début de
+``base.html`` (``<head>``, feuilles de style, en-tête du site) part avant
+que le bloc ``content`` ne soit calculé ; dans les blocs, les boucles
+``{% for %}`` sont rendues ligne par ligne et envoyées par morceaux de
+``CHUNK_SIZE``. Le navigateur télécharge les ressources et affiche
+l'en-tête pendant que la base répond.
+
+Pour que l'en-tête parte vraiment avant les requêtes SQL, la vue passe
+les valeurs coûteuses sous forme paresseuse (``SimpleLazyObject``) : elles
+sont évaluées au moment où le gabarit les utilise. Une boucle sur un
+queryset pas encore évalué (ou sur une page de ``Paginator`` qui en
+contient un) le parcourt avec ``.iterator()`` : les premières lignes
+partent avant la fin de la requête. ``forloop.last`` est alors connu avec
+une ligne d'avance, et ``forloop.revcounter`` coûte un ``COUNT`` s'il est
+utilisé. Les pages de ``CursorPaginator`` sont déjà des listes (la ligne
+suivante est lue pour savoir s'il existe une page suivante).
+
+Le corps étant produit après le passage des middlewares, tout ce qui
+modifie la réponse est fait avant le premier morceau : processeurs de
+contexte (session, panier), jeton CSRF et messages flash (marqués lus,
+sinon ils seraient réaffichés à la page suivante). Une erreur en cours de
+rendu ne peut plus changer le statut : elle est journalisée et la page
+reste tronquée.
+
+Le flux n'est effectif qu'en WSGI (gunicorn) ; sous ASGI, Django 4.2
+rassemble un itérateur synchrone avant de l'envoyer.
+"""
+import logging
+from itertools import chain, islice
+
+from django.contrib.messages import get_messages
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.template.context import make_context
+from django.template.defaulttags import ForNode
+from django.template.loader import get_template
+from django.template.loader_tags import BLOCK_CONTEXT_KEY, BlockContext, BlockNode, ExtendsNode
+
+logger = logging.getLogger(__name__)
+
+# Taille minimale d'un morceau envoyé, hors points de vidage (début de bloc)
+CHUNK_SIZE = 4096
+# Lignes lues à la fois par les boucles sur un queryset
+ITERATOR_CHUNK_SIZE = 10
+
+
+def stream_render(request, template_name, context=None, content_type=None, status=None):
+    """Équivalent de ``render`` qui renvoie une ``StreamingHttpResponse``."""
+    context = dict(context or {})
+    context['messages'] = list(get_messages(request))
+    get_token(request)
+
+    template = get_template(template_name).template
+    chunks = _stream_template(template, make_context(context, request), template_name)
+    # Premier morceau produit ici : les processeurs de contexte s'exécutent dans la vue
+    head = next(chunks, '')
+    response = StreamingHttpResponse(chain([head], chunks), content_type=content_type, status=status)
+    # nginx : ne pas mettre la réponse en tampon
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _stream_template(template, context, template_name):
+    buffer = []
+    size = 0
+    try:
+        with context.render_context.push_state(template), context.bind_template(template):
+            context.template_name = template.name
+            for part in _render_nodelist(template.nodelist, context):
+                if part is None:
+                    if buffer:
+                        yield ''.join(buffer)
+                        buffer, size = [], 0
+                    continue
+                buffer.append(part)
+                size += len(part)
+                if size >= CHUNK_SIZE:
+                    yield ''.join(buffer)
+                    buffer, size = [], 0
+    except Exception:
+        logger.exception("Rendu en flux interrompu : %s", template_name)
+        raise
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _render_nodelist(nodelist, context):
+    """Morceaux de ``nodelist`` ; ``None`` marque un point où vider le tampon."""
+    for node in nodelist:
+        if isinstance(node, ExtendsNode):
+            yield from _render_extends(node, context)
+            # Comme Template._render : rien après {% extends %} n'est rendu
+            return
+        if isinstance(node, BlockNode):
+            yield None
+            yield from _render_block(node, context)
+        elif isinstance(node, ForNode) and len(node.loopvars) == 1:
+            yield from _render_for(node, context)
+        else:
+            yield node.render_annotated(context)
+
+
+def _render_extends(node, context):
+    """Reprend ``ExtendsNode.render`` en rendant le parent morceau par morceau."""
+    parent = node.get_parent(context)
+    if BLOCK_CONTEXT_KEY not in context.render_context:
+        context.render_context[BLOCK_CONTEXT_KEY] = BlockContext()
+    block_context = context.render_context[BLOCK_CONTEXT_KEY]
+    block_context.add_blocks(node.blocks)
+    if not any(isinstance(n, ExtendsNode) for n in parent.nodelist):
+        block_context.add_blocks({n.name: n for n in parent.nodelist.get_nodes_by_type(BlockNode)})
+    with context.render_context.push_state(parent, isolated_context=False):
+        yield from _render_nodelist(parent.nodelist, context)
+
+
+def _render_block(node, context):
+    """Reprend ``BlockNode.render`` : le bloc le plus dérivé, ``{{ block.super }}`` compris."""
+    block_context = context.render_context.get(BLOCK_CONTEXT_KEY)
+    with context.push():
+        if block_context is None:
+            context['block'] = node
+            yield from _render_nodelist(node.nodelist, context)
+            return
+        push = block = block_context.pop(node.name)
+        if block is None:
+            block = node
+        block = type(node)(block.name, block.nodelist)
+        block.context = context
+        context['block'] = block
+        yield from _render_nodelist(block.nodelist, context)
+        if push is not None:
+            block_context.push(node.name, push)
+
+
+class _LazyLoop(dict):
+    """``forloop`` d'une boucle sur un queryset : ``revcounter`` n'est compté qu'à la demande."""
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(**kwargs)
+        self._queryset = queryset
+        self._total = None
+
+    def __missing__(self, key):
+        if key not in ('revcounter', 'revcounter0'):
+            raise KeyError(key)
+        if self._total is None:
+            self._total = self._queryset.count()
+        remaining = self._total - self['counter0']
+        return remaining if key == 'revcounter' else remaining - 1
+
+
+def _unevaluated_queryset(values):
+    """Queryset pas encore évalué derrière ``values`` (directement ou via une page), sinon None."""
+    values = getattr(values, 'object_list', values)
+    if isinstance(values, QuerySet) and values._result_cache is None:
+        return values
+    return None
+
+
+def _render_for(node, context):
+    """Reprend ``ForNode.render`` (une seule variable de boucle), une ligne à la fois."""
+    parentloop = context['forloop'] if 'forloop' in context else {}
+    with context.push():
+        values = node.sequence.resolve(context, ignore_failures=True)
+        queryset = None if node.is_reversed else _unevaluated_queryset(values)
+        if queryset is not None:
+            yield from _render_for_iterator(node, context, queryset, parentloop)
+            return
+        if values is None:
+            values = []
+        if not hasattr(values, '__len__'):
+            values = list(values)
+        len_values = len(values)
+        if len_values < 1:
+            yield from _render_nodelist(node.nodelist_empty, context)
+            return
+        if node.is_reversed:
+            values = reversed(values)
+        loop_dict = context['forloop'] = {'parentloop': parentloop}
+        for i, item in enumerate(values):
+            loop_dict['counter0'] = i
+            loop_dict['counter'] = i + 1
+            loop_dict['revcounter'] = len_values - i
+            loop_dict['revcounter0'] = len_values - i - 1
+            loop_dict['first'] = i == 0
+            loop_dict['last'] = i == len_values - 1
+            context[node.loopvars[0]] = item
+            yield from _render_nodelist(node.nodelist_loop, context)
+
+
+def _render_for_iterator(node, context, queryset, parentloop):
+    """Boucle sur ``queryset.iterator()`` ; ``last`` est lu une ligne en avance."""
+    rows = queryset.iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    pending = list(islice(rows, 1))
+    if not pending:
+        yield from _render_nodelist(node.nodelist_empty, context)
+        return
+    loop_dict = context['forloop'] = _LazyLoop(queryset, parentloop=parentloop)
+    i = 0
+    while pending:
+        item = pending.pop()
+        pending = list(islice(rows, 1))
+        loop_dict['counter0'] = i
+        loop_dict['counter'] = i + 1
+        loop_dict['first'] = i == 0
+        loop_dict['last'] = not pending
+        context[node.loopvars[0]] = item
+        yield from _render_nodelist(node.nodelist_loop, context)
+        i += 1
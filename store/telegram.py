@@ -9,7 +9,7 @@ def send_telegram_message(message):
     # Fallback to DB config if settings are empty
     if not token or not chat_id:
         try:
-            cfg = SiteConfig.get_solo()
+            cfg = SiteConfig.get_cached()
             token = token or cfg.telegram_bot_token
             chat_id = chat_id or cfg.telegram_chat_id
         except Exception:
@@ -0,0 +1,70 @@
+"""Chargeur de gabarits qui allège le HTML source avant compilation.
+
+Placé sous ``django.template.loaders.cached.Loader``, il n'agit qu'une fois
+par gabarit et par processus : le gabarit compilé (et mis en cache) est
+déjà allégé, rien n'est fait par requête.
+
+Sur les gabarits ``.html`` :
+
+* chaque suite d'espaces contenant un saut de ligne devient un seul saut
+  de ligne (indentation et lignes vides disparaissent ; les espaces d'une
+  même ligne, significatifs entre éléments en ligne, sont gardés, et les
+  sauts de ligne restent là où le JavaScript des attributs en dépend) ;
+* les commentaires HTML sont retirés, sauf les commentaires
+  conditionnels et ceux qui contiennent une balise de gabarit ``{% %}``
+  (les retirer casserait la structure du gabarit) ;
+* le contenu des blocs ``<pre>``, ``<textarea>`` et ``<script>`` est
+  laissé intact.
+"""
+import re
+
+from django.template.loaders.base import Loader as BaseLoader
+
+PROTECTED_BLOCK = re.compile(r'(<(pre|textarea|script)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+HTML_COMMENT = re.compile(r'<!--(?!\[if|<!|>)(?:(?!\{%).)*?-->', re.DOTALL)
+LINE_BREAK_RUN = re.compile(r'[ \t\r\f\v]*\n\s*')
+MINIFIED_SUFFIXES = ('.html',)
+
+
+def minify(source):
+    parts = PROTECTED_BLOCK.split(source)
+    result = []
+    # split() avec deux groupes : texte, bloc protégé, nom de balise, texte, …
+    for index in range(0, len(parts), 3):
+        text = HTML_COMMENT.sub('', parts[index])
+        result.append(LINE_BREAK_RUN.sub('\n', text))
+        if index + 1 < len(parts):
+            result.append(parts[index + 1])
+    return ''.join(result)
+
+
+class Loader(BaseLoader):
+    """Enveloppe d'autres chargeurs, comme ``cached.Loader`` : ``('store.template_loaders.Loader', [...])``."""
+
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            for origin in loader.get_template_sources(template_name):
+                # L'origine pointe vers ce chargeur pour que get_contents passe par ici
+                origin.source_loader = origin.loader
+                origin.loader = self
+                yield origin
+
+    def get_contents(self, origin):
+        contents = origin.source_loader.get_contents(origin)
+        if origin.name.endswith(MINIFIED_SUFFIXES):
+            return minify(contents)
+        return contents
+
+    def get_dirs(self):
+        # Répertoires surveillés par l'autoreloader en DEBUG (comme cached.Loader)
+        for loader in self.loaders:
+            if hasattr(loader, 'get_dirs'):
+                yield from loader.get_dirs()
+
+    def reset(self):
+        for loader in self.loaders:
+            loader.reset()
@@ -0,0 +1,11 @@
+from django import template
+
+from store.fragments import render_card
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_card(product, style='list'):
+    """Carte produit pré-rendue (voir ``store.fragments``)."""
+    return render_card(product, style)
@@ -0,0 +1,109 @@
+"""Produits tendance : ventes récentes pondérées par une décroissance exponentielle.
+
+Une vente de quantité ``q`` à l'instant ``t`` vaut ``q × 2^(-(maintenant - t) / demi-vie)``.
+Plutôt que de faire décroître tous les scores au fil du temps, chaque vente
+est comptée multipliée par ``2^((t - TREND_EPOCH) / demi-vie)`` : le facteur
+commun ``2^(-(maintenant - TREND_EPOCH) / demi-vie)`` ne change pas le
+classement. Ce poids croît sans borne (il dépasserait la capacité d'un
+flottant vers 2033) : le score est donc stocké en base 2 logarithmique,
+``log2(Σ poids)``, et une vente s'y ajoute par log-somme-exp
+(``max(a, b) + log2(1 + 2^-|a - b|)``), dans un seul ``UPDATE`` (signal
+``post_save`` sur ``OrderItem``). Le logarithme étant croissant, le top N
+se lit toujours sur l'index de ``ProductTrend.score``.
+
+``manage.py rebuild_trending`` recalcule tout (commandes annulées ou
+supprimées après coup, changement de demi-vie).
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.utils import timezone
+
+from .caching import tiered
+from .models import OrderItem, ProductTrend
+
+TREND_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+TREND_HALF_LIFE = timedelta(days=3)
+# Au-delà, une vente pèse moins de 1/256 d'une vente du jour
+TREND_HORIZON = TREND_HALF_LIFE * 8
+TOP_N = 24
+TOP_CACHE_KEY = 'trending:top'
+TOP_CACHE_TIMEOUT = 300
+
+
+def weight(quantity, when):
+    """``log2`` du poids d'une vente (reste borné quelle que soit la date)."""
+    return math.log2(quantity) + (when - TREND_EPOCH) / TREND_HALF_LIFE
+
+
+def log_add(a, b):
+    """``log2(2^a + 2^b)`` sans calculer ``2^a`` ni ``2^b``."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + math.pow(2.0, low - high))
+
+
+def current_score(score, now=None):
+    """Ventes pondérées équivalentes à ``now`` pour un score stocké."""
+    now = now or timezone.now()
+    return math.pow(2.0, score - (now - TREND_EPOCH) / TREND_HALF_LIFE)
+
+
+def counted_items(since):
+    return OrderItem.objects.filter(
+        order__is_deleted=False, order__created_at__gte=since
+    ).exclude(order__status='cancelled')
+
+
+def record_sale(product_id, quantity, when):
+    """Ajoute une vente au score du produit (une requête dans le cas courant)."""
+    value = weight(quantity, when)
+    # log_add() en SQL, pour que deux ventes simultanées s'additionnent sans se perdre
+    combined = Greatest(F('score'), Value(value)) + Log(
+        Value(2.0), Value(1.0) + Power(Value(2.0), -Abs(F('score') - Value(value)))
+    )
+    if not ProductTrend.objects.filter(product_id=product_id).update(score=combined):
+        trend, created = ProductTrend.objects.get_or_create(product_id=product_id, defaults={'score': value})
+        if not created:
+            ProductTrend.objects.filter(product_id=product_id).update(score=combined)
+
+
+@transaction.atomic
+def rebuild(now=None):
+    """Recalcule tous les scores à partir des commandes de l'horizon. Renvoie le nombre de produits."""
+    now = now or timezone.now()
+    scores = {}
+    rows = counted_items(now - TREND_HORIZON).values_list(
+        'variant__product_id', 'quantity', 'order__created_at'
+    )
+    for product_id, quantity, created_at in rows.iterator(chunk_size=5000):
+        value = weight(quantity, created_at)
+        scores[product_id] = log_add(scores[product_id], value) if product_id in scores else value
+
+    ProductTrend.objects.all().delete()
+    ProductTrend.objects.bulk_create(
+        [ProductTrend(product_id=pk, score=score) for pk, score in scores.items()],
+        batch_size=1000,
+    )
+    tiered.delete(TOP_CACHE_KEY)
+    return len(scores)
+
+
+def top_product_ids():
+    """IDs des ``TOP_N`` produits les plus tendance, matérialisés en cache."""
+    def compute():
+        since = weight(1, timezone.now() - TREND_HORIZON)
+        return list(
+            ProductTrend.objects.filter(score__gte=since)
+            .order_by('-score')
+            .values_list('product_id', flat=True)[:TOP_N]
+        )
+
+    return tiered.get_or_set(TOP_CACHE_KEY, compute, TOP_CACHE_TIMEOUT)
+
+
+def best_sellers(catalog, limit=6):
+    """Meilleures ventes récentes, résolues dans l'instantané du catalogue."""
+    return catalog.resolve(top_product_ids())[:limit]
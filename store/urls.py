@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import views, views_admin, views_cart, views_avis
+from .views import views, views_admin, views_cart, views_avis, views_api
 from django.conf.urls import handler404, handler500
 from .views import views_errors
 
@@ -10,7 +10,9 @@ urlpatterns = [
     # Pages principales
     path('', views.home, name='home'),
     path('produits/', views.product_list, name='product_list'),
+    path('produits/categorie/<int:category_id>/', views.category_products, name='category_products'),
     path('produit/<int:pk>/', views.product_detail, name='product_detail'),
+    path('produit/<int:pk>/vue/', views.product_view, name='product_view'),
     path('commander/', views.order_create, name='order_create'),
     path('a-propos/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
@@ -58,4 +60,10 @@ urlpatterns = [
     path('avis/<int:review_id>/modifier/', views_avis.review_edit, name='review_edit'),
     path('avis/<int:review_id>/supprimer/', views_avis.review_delete, name='review_delete'),
     path('produit/<int:pk>/avis/', views_avis.product_reviews, name='product_reviews'),
+
+    # API catalogue
+    path('api/produits/', views_api.api_products, name='api_products'),
+    path('api/produits/<int:pk>/', views_api.api_product_detail, name='api_product_detail'),
+    path('api/categories/', views_api.api_categories, name='api_categories'),
+    path('api/catalogue/changements/', views_api.catalog_changes, name='api_catalog_changes'),
 ]
@@ -1,13 +1,58 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from .cookie_cart import CookieCart
 from .models import Cart, Product
 
+CART_COUNT_COOKIE = 'cart_count'
+CART_COUNT_SESSION_KEY = 'cart_count'
+
 def get_or_create_cart(request):
-    """Get or create a cart for authenticated or anonymous users"""
+    """Panier en base de l'utilisateur connecté, créé au besoin.
+
+    Écrit en base : réservé à l'ajout au panier. Les visiteurs anonymes ont
+    un ``CookieCart``.
+    """
+    cart, created = Cart.objects.get_or_create(user=request.user)
+    return cart
+
+def get_cart(request):
+    """Panier courant, sans rien créer en base.
+
+    ``Cart`` de l'utilisateur connecté (``None`` s'il n'en a pas), ou
+    ``CookieCart`` lu dans le cookie du visiteur anonyme.
+    """
     if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-    else:
-        if not request.session.session_key:
-            request.session.create()
-        session_key = request.session.session_key
-        cart, created = Cart.objects.get_or_create(session_key=session_key, user=None)
-    return cart
\ No newline at end of file
+        return Cart.objects.filter(user=request.user).first()
+    return CookieCart.for_request(request)
+
+def get_cart_count(request):
+    """Nombre de lignes du panier courant ; sans créer de session ni de panier.
+
+    Lu dans le cookie pour un anonyme, gardé en session pour un utilisateur connecté.
+    """
+    if not request.user.is_authenticated:
+        return CookieCart.for_request(request).count()
+    count = request.session.get(CART_COUNT_SESSION_KEY)
+    if count is None:
+        cart = get_cart(request)
+        count = cart.items.count() if cart is not None else 0
+        request.session[CART_COUNT_SESSION_KEY] = count
+    return count
+
+
+def remember_cart_count(request, response, count):
+    """Garde le nombre d'articles en session et dans le cookie lu par js/prerender.js."""
+    if request.user.is_authenticated:
+        request.session[CART_COUNT_SESSION_KEY] = count
+    response.set_cookie(
+        CART_COUNT_COOKIE, str(count), samesite='Lax', secure=settings.SESSION_COOKIE_SECURE
+    )
+    return response
+
+
+def save_cookie_cart(request, cart, response):
+    """Réécrit le cookie d'un ``CookieCart`` modifié à l'affichage (lignes retirées, prix vus)."""
+    if isinstance(cart, CookieCart) and cart.modified:
+        remember_cart_count(request, response, cart.count())
+        cart.save(response)
+    return response
@@ -0,0 +1,128 @@
+"""Compteurs de vues produit à écriture différée.
+
+``record_view`` n'écrit rien en base : chaque worker cumule les vues en
+mémoire par ``(produit, jour)``. Une fois la réponse envoyée (signal
+``request_finished``), si ``FLUSH_INTERVAL`` secondes se sont écoulées, le
+tampon est vidé en un seul ``INSERT ... ON DUPLICATE KEY UPDATE`` dans
+``ProductViewCount``. Un produit vu au moins ``HOT_THRESHOLD`` fois dans un
+intervalle est écrit sur un shard tiré au hasard, pour que les workers ne se
+disputent pas la même ligne.
+"""
+import atexit
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Product, ProductViewCount
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 10
+FLUSH_MAX_KEYS = 1000
+COUNTER_SHARDS = 8
+HOT_THRESHOLD = 50
+
+
+class ViewBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._flushed_at = time.monotonic()
+
+    def add(self, product_id, day):
+        with self._lock:
+            self._counts[(product_id, day)] += 1
+
+    @property
+    def is_due(self):
+        return bool(self._counts) and (
+            time.monotonic() - self._flushed_at >= FLUSH_INTERVAL or len(self._counts) >= FLUSH_MAX_KEYS
+        )
+
+    def drain(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._flushed_at = time.monotonic()
+        return counts
+
+
+buffer = ViewBuffer()
+
+
+def record_view(product_id):
+    """Compte une vue de la fiche produit, sans requête."""
+    buffer.add(product_id, timezone.localdate())
+
+
+def _upsert_sql(rows):
+    table = connection.ops.quote_name(ProductViewCount._meta.db_table)
+    views = connection.ops.quote_name('views')
+    placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+    sql = f"INSERT INTO {table} (product_id, day, shard, {views}) VALUES {placeholders} "
+    if connection.vendor == 'mysql':
+        sql += f"ON DUPLICATE KEY UPDATE {views} = {views} + VALUES({views})"
+    else:
+        sql += f"ON CONFLICT (product_id, day, shard) DO UPDATE SET {views} = {table}.{views} + excluded.{views}"
+    return sql, [value for row in rows for value in row]
+
+
+def flush():
+    """Écrit le tampon du worker en une requête. Renvoie le nombre de vues écrites."""
+    counts = buffer.drain()
+    if not counts:
+        return 0
+    existing = set(
+        Product.objects.filter(pk__in={pk for pk, _ in counts}).values_list('pk', flat=True)
+    )
+    # Ordre stable des lignes : évite les interblocages entre workers
+    rows = [
+        (pk, day, random.randrange(1, COUNTER_SHARDS) if n >= HOT_THRESHOLD else 0, n)
+        for (pk, day), n in sorted(counts.items())
+        if pk in existing
+    ]
+    if not rows:
+        return 0
+    sql, params = _upsert_sql(rows)
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+    except DatabaseError:
+        logger.exception("Échec de l'écriture de %s compteur(s) de vues", len(rows))
+        return 0
+    return sum(row[3] for row in rows)
+
+
+def flush_if_due():
+    if buffer.is_due:
+        flush()
+        close_old_connections()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def view_totals(days=30, limit=10):
+    """Total des vues sur ``days`` jours et produits les plus consultés."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    counts = ProductViewCount.objects.filter(day__gte=since)
+    total = counts.aggregate(total=Sum('views'))['total'] or 0
+    top = list(
+        counts.values('product_id', 'product__name')
+        .annotate(views=Sum('views'))
+        .order_by('-views')[:limit]
+    )
+    return total, top
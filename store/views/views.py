@@ -5,76 +5,177 @@ from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Avg, Count
 from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_POST
 
 from store.models import (
-    Product, Category, Order, OrderItem,
+    Product, Order, OrderItem,
     CommunityPost, Cart, ProductVariant
 )
 from store.forms import (
     OrderForm, CustomUserCreationForm, CommunityPostForm, UserProfileForm
 )
-from store.utils import get_or_create_cart
+from store.cart_pricing import price_cart
+from store.cookie_cart import CookieCart
+from store.utils import get_cart, remember_cart_count, save_cookie_cart
+from store.search import search_products
+from store import fragments
+from store.catalog import get_catalog
+from store.recommendations import bought_together
+from store.trending import best_sellers
+from store.view_counts import record_view
+from store.facets import FacetFilters, compute_facets
+from store.listing import (
+    DEFAULT_SORT, SORT_CHOICES, SORT_KEYS, IndexedListing, get_listing_index, order_queryset
+)
 from store.telegram import send_telegram_message
+from store.page_cache import anonymous_page_cache
+from store.degradation import unless_degraded
+from store.http_cache import (
+    add_surrogate_keys, conditional_page, home_state, listing_state, product_keys, product_state
+)
 
 
 # -------------------- HOME --------------------
+@conditional_page(home_state)
+@anonymous_page_cache()
 def home(request):
-    featured_products = Product.objects.filter(is_available=True).select_related('category').prefetch_related('variants')[:6]
-    latest_reviews = CommunityPost.objects.select_related('product', 'author').filter(is_approved=True)[:5]
+    catalog = get_catalog()
+    latest_reviews = unless_degraded(
+        lambda: list(CommunityPost.objects.select_related('product', 'author').filter(is_approved=True)[:5]),
+        list,
+    )
+
+    featured_products = best_sellers(catalog, 6)
+    has_best_sellers = bool(featured_products)
+    if len(featured_products) < 6:
+        seen = {p.id for p in featured_products}
+        featured_products += [p for p in catalog.product_list[:6 + len(seen)] if p.id not in seen]
 
     context = {
-        'featured_products': featured_products,
+        'featured_products': featured_products[:6],
+        'has_best_sellers': has_best_sellers,
         'latest_reviews': latest_reviews,
-        'total_products': Product.objects.filter(is_available=True).count(),
-        'total_categories': Category.objects.count(),
+        'total_products': len(catalog.product_list),
+        'total_categories': len(catalog.categories),
     }
+    fragments.prefetch(context['featured_products'])
+    add_surrogate_keys(request, 'home', 'reviews', product_keys(context['featured_products']))
     return render(request, 'store/home.html', context)
 
 
 # -------------------- PRODUCT LIST --------------------
+@conditional_page(listing_state)
+@anonymous_page_cache()
 def product_list(request):
-    products = Product.objects.filter(is_available=True).select_related('category')
-    categories = Category.objects.all()
-
-    category_id = request.GET.get('category')
-    search_query = request.GET.get('search')
-
-    if category_id:
-        products = products.filter(category_id=category_id)
+    catalog = get_catalog()
+    products = Product.objects.filter(is_available=True)
+    search_query = request.GET.get('search', '').strip()
+    filters = FacetFilters.from_query(request.GET)
+    sort = request.GET.get('sort')
+    if sort not in SORT_KEYS:
+        sort = None
 
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(name_ar__icontains=search_query)
+        products = search_products(products, search_query)
+
+    # Comptages de toutes les facettes en une requête groupée (mise en cache)
+    facets = compute_facets(products, f'product_list:{search_query}', filters, catalog.categories)
+
+    if search_query or filters.price_bands or filters.min_rating:
+        # Filtres que l'index de tri ne couvre pas : tri en base
+        products = filters.apply(products)
+        if sort or not search_query:
+            products = order_queryset(products, sort or DEFAULT_SORT)
+        # Pages comptées sur le même queryset que les lignes (le cube peut dater de FACET_CACHE_TIMEOUT)
+        paginator = Paginator(products.values_list('pk', flat=True), 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.object_list = catalog.resolve(list(page_obj.object_list))
+    else:
+        # Page = tranche de l'index en mémoire, résolue dans l'instantané
+        listing = IndexedListing(
+            get_listing_index(catalog.generation), catalog.resolve,
+            filters.categories, sort or DEFAULT_SORT,
         )
+        page_obj = Paginator(listing, 12).get_page(request.GET.get('page'))
 
-    paginator = Paginator(products, 12)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    filter_query = request.GET.copy()
+    filter_query.pop('page', None)
+
+    fragments.prefetch(page_obj.object_list)
+    add_surrogate_keys(request, 'listing', product_keys(page_obj.object_list))
+    add_surrogate_keys(request, (f"category-{c['id']}" for c in facets['categories'] if c['selected']))
 
     context = {
         'page_obj': page_obj,
-        'categories': categories,
-        'current_category': int(category_id) if category_id else None,
-        'search_query': search_query or '',
+        'facets': facets,
+        'current_categories': [c for c in facets['categories'] if c['selected']],
+        'is_filtered': filters.is_active,
+        'min_rating': filters.min_rating,
+        'search_query': search_query,
+        'sort': sort or ('' if search_query else DEFAULT_SORT),
+        'sort_choices': SORT_CHOICES,
+        'filter_query': filter_query.urlencode(),
     }
     return render(request, 'store/product_list.html', context)
 
 
+# -------------------- CATEGORY --------------------
+def category_products(request, category_id):
+    """Liste filtrée sur une catégorie, à une URL propre (pages pré-rendues)."""
+    if not any(category.id == category_id for category in get_catalog().categories):
+        raise Http404("Catégorie introuvable")
+    query = request.GET.copy()
+    query.setlist('category', [str(category_id)])
+    request.GET = query
+    return product_list(request)
+
+
 # -------------------- PRODUCT DETAIL --------------------
-def product_detail(request, pk):
-    product = get_object_or_404(Product.objects.select_related('category').prefetch_related('variants', 'additional_images'), pk=pk, is_available=True)
-    related_products = Product.objects.filter(
-        category=product.category, is_available=True
-    ).exclude(pk=product.pk).only('id','name','image','price')[:4]
+VIEW_DEDUPE_SECONDS = 30 * 60
 
-    product_reviews = CommunityPost.objects.select_related('author').filter(
-        product=product, is_approved=True, rating__isnull=False
-    ).order_by('-created_at')[:5]
 
-    reviews_stats = product_reviews.aggregate(avg_rating=Avg('rating'), count=Count('id'))
+def _count_view(request, pk):
+    record_view(pk)
+
+
+@require_POST
+def product_view(request, pk):
+    """Vue comptée depuis une fiche pré-rendue (``js/prerender.js``).
+
+    Le jeton CSRF (celui du cookie, envoyé par le script) est exigé ; une
+    même fiche n'est comptée qu'une fois par jeton et par ``VIEW_DEDUPE_SECONDS``.
+    """
+    if get_catalog().get_product(pk) is None:
+        raise Http404("Produit introuvable")
+    if cache.add(f'product_view:{pk}:{request.META.get("CSRF_COOKIE")}', 1, VIEW_DEDUPE_SECONDS):
+        record_view(pk)
+    return HttpResponse(status=204)
+
+
+@conditional_page(product_state, on_not_modified=_count_view)
+@anonymous_page_cache(on_hit=_count_view)
+def product_detail(request, pk):
+    catalog = get_catalog()
+    product = catalog.get_product(pk)
+    if product is None:
+        raise Http404("Produit introuvable")
+    # Rendus sans visiteur (pré-rendu, recalcul en arrière-plan) : pas de vue comptée
+    if not getattr(request, 'synthetic', False):
+        record_view(product.id)
+    # Accessoires : remplacés par des valeurs sans base quand celle-ci est lente
+    related_products = unless_degraded(
+        lambda: bought_together(catalog, product, 4), lambda: catalog.related(product, 4)
+    )
+    product_reviews = unless_degraded(
+        lambda: list(CommunityPost.objects.select_related('author').filter(
+            product_id=product.id, is_approved=True, rating__isnull=False
+        ).order_by('-created_at')[:5]),
+        list,
+    )
+
     variants = product.available_variants()
 
     if request.method == 'POST' and 'submit_review' in request.POST:
@@ -86,7 +187,7 @@ def product_detail(request, pk):
         if form.is_valid():
             review = form.save(commit=False)
             review.author = request.user
-            review.product = product
+            review.product_id = product.id
             review.is_approved = True
             review.save()
             messages.success(request, "Votre avis a été ajouté avec succès !")
@@ -101,55 +202,68 @@ def product_detail(request, pk):
         'variants': variants,
         'related_products': related_products,
         'product_reviews': product_reviews,
-        'avg_rating': round(reviews_stats['avg_rating'], 1) if reviews_stats['avg_rating'] else None,
-        'review_count': reviews_stats['count'],
+        'avg_rating': product.average_rating() or None,
+        'review_count': product.review_count(),
         'review_form': form,
     }
+    fragments.prefetch(related_products)
+    add_surrogate_keys(request, f'reviews-{product.id}', product_keys([product, *related_products]))
     return render(request, 'store/product_detail.html', context)
 
 
 # -------------------- ORDER CREATE --------------------
 def order_create(request):
-    cart = get_or_create_cart(request)
-    if not cart or not cart.items.exists():
+    cart = get_cart(request)
+    pricing = price_cart(cart)
+    if not pricing:
         messages.warning(request, "Votre panier est vide.")
-        return redirect('view_cart')
+        return save_cookie_cart(request, cart, redirect('view_cart'))
 
     if request.method == 'POST':
         form = OrderForm(request.POST)
-        if form.is_valid():
+        if pricing.changed_lines:
+            # Prix modifiés depuis la dernière consultation : les montrer avant d'enregistrer
+            messages.warning(request, "Des prix ont changé : vérifiez votre commande avant de l'envoyer.")
+        elif form.is_valid():
             order = form.save(commit=False)
             if request.user.is_authenticated:
                 order.user = request.user
             order.save()
 
-            for item in cart.items.all():
+            for line in pricing.lines:
                 OrderItem.objects.create(
                     order=order,
-                    variant=item.variant,
-                    quantity=item.quantity,
-                    price=item.variant.price,
+                    variant=line.variant,
+                    quantity=line.quantity,
+                    price=line.price,
                 )
 
-            cart.items.all().delete()
-            if not request.user.is_authenticated:
-                cart.delete()
+            # Panier cookie (anonyme) : vidé avec la réponse, rien à supprimer en base
+            if isinstance(cart, CookieCart):
+                cart.clear()
+            else:
+                cart.items.all().delete()
 
             send_order_notification(order)
 
             whatsapp_url = f"https://wa.me/{settings.ADMIN_WHATSAPP_NUMBER}?text={quote(generate_order_message(order))}"
             messages.success(request, 'Votre commande a été envoyée avec succès !')
             total_general = sum(item.quantity * item.price for item in order.items.all())
-            return render(request, 'store/order_success.html', {
+            response = render(request, 'store/order_success.html', {
              'order': order,
              'whatsapp_url': whatsapp_url,  # <-- add comma here
             'total_general': total_general,
                 })
+            if isinstance(cart, CookieCart):
+                cart.save(response)
+            return remember_cart_count(request, response, 0)
 
     else:
         form = OrderForm()
 
-    return render(request, 'store/order_form.html', {'form': form, 'cart': cart})
+    response = render(request, 'store/order_form.html', {'form': form, 'pricing': pricing})
+    pricing.acknowledge()
+    return save_cookie_cart(request, cart, response)
 
 
 def send_order_notification(order):
@@ -192,12 +306,14 @@ def generate_order_message(order):
 # -------------------- DIRECT ORDER --------------------
 def direct_order(request, product_id):
     product = get_object_or_404(Product, pk=product_id)
-    variant_id = request.POST.get('variant_id') or product.default_variant_id
+    # Arrivée depuis la fiche produit en GET (formulaire sans jeton CSRF), puis envoi en POST
+    data = request.POST if request.method == 'POST' else request.GET
+    variant_id = data.get('variant_id') or product.default_variant_id
     variant = get_object_or_404(ProductVariant, pk=variant_id)
 
     # Récupérer la quantité envoyée depuis la page produit
     try:
-        quantity = int(request.POST.get('quantity', 1))
+        quantity = int(data.get('quantity', 1))
         quantity = max(quantity, 1)
     except (TypeError, ValueError):
         quantity = 1
@@ -287,9 +403,11 @@ def profile(request):
 
 
 # -------------------- STATIC PAGES --------------------
+@anonymous_page_cache()
 def about(request):
     return render(request, 'store/about.html')
 
 
+@anonymous_page_cache()
 def contact(request):
     return render(request, 'store/contact.html')
@@ -5,13 +5,20 @@ from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_protect
 from django.db import models, transaction
-from django.db.models import Prefetch, Q
+from django.db.models import Prefetch
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from store.models import (
     Order, OrderItem, Product, ProductVariant,
     ProductImage, Category, CommunityPost, SiteConfig
 )
 from store.forms import ProductForm,ProductVariantForm, ProductVariantFormSet, CategoryForm,OrderExportFilterForm
+from store.pagination import CursorPaginator, estimated_count
+from store.search import MAX_RESULTS, order_by_ids, search_product_ids
+from store.view_counts import view_totals
+from store.caching import tiered
+from store import degradation, page_cache
+from store.streaming import stream_render
 
 import json
 import openpyxl
@@ -35,52 +42,54 @@ def admin_dashboard(request):
     orders_qs = (
         Order.objects.filter(is_deleted=False)
         .prefetch_related(Prefetch("items", queryset=OrderItem.objects.select_related("variant")))
-        .order_by("-created_at")
     )
-
-    paginator = Paginator(orders_qs, 10)
-    page_number = request.GET.get("order_page", 1)
-    try:
-        orders = paginator.page(page_number)
-    except (PageNotAnInteger, EmptyPage):
-        orders = paginator.page(1)
+    orders = CursorPaginator(orders_qs, 10).get_page(request, "order_page")
 
     stats = [
         {
-            "count": Product.objects.count(),
+            "count": estimated_count(Product.objects.all()),
             "label": "Produits",
             "color": "text-olive-600",
             "icon": "📦",
             "url": reverse("admin_product_list"),
         },
         {
-            "count": CommunityPost.objects.count(),
+            "count": estimated_count(CommunityPost.objects.all()),
             "label": "Avis",
             "color": "text-blue-600",
             "icon": "💬",
             "url": reverse("post_list"),
         },
         {
-            "count": orders_qs.filter(status="pending").count(),
+            "count": estimated_count(orders_qs.filter(status="pending")),
             "label": "Commandes en cours",
             "color": "text-yellow-600",
             "icon": "⏳",
             "url": reverse("order_list") + "?status=pending",
         },
         {
-            "count": orders_qs.filter(status="delivered").count(),
+            "count": estimated_count(orders_qs.filter(status="delivered")),
             "label": "Commandes livrées",
             "color": "text-green-600",
             "icon": "✅",
             "url": reverse("order_list") + "?status=delivered",
         },
     ]
+    total_views, most_viewed = tiered.get_or_set("dashboard:views", lambda: view_totals(30), 60)
+    stats.append({
+        "count": total_views,
+        "label": "Vues produits (30 jours)",
+        "color": "text-purple-600",
+        "icon": "👁️",
+        "url": "#most-viewed",
+    })
 
     # Config form processing (Telegram) with safe fallback if table not migrated yet
     config = None
     try:
-        config = SiteConfig.get_solo()
+        config = SiteConfig.get_cached()
         if request.method == "POST" and request.POST.get("_config") == "1":
+            config = SiteConfig.get_solo()
             config.telegram_bot_token = request.POST.get("telegram_bot_token", "").strip()
             config.telegram_chat_id = request.POST.get("telegram_chat_id", "").strip()
             config.save()
@@ -94,7 +103,11 @@ def admin_dashboard(request):
         "stats": stats,
         "products": Product.objects.select_related("category").order_by("-id")[:20],
         "orders": orders,
-        "orders_count": orders_qs.count(),
+        "orders_count": estimated_count(orders_qs),
+        "most_viewed": most_viewed,
+        "cache_stats": tiered.stats(),
+        "page_cache_stats": page_cache.pages.stats(),
+        "db_latency": degradation.tracker.stats(),
         "recent_orders_count": 10,
         "config": config,
     })
@@ -173,20 +186,15 @@ def order_list(request):
     if status:
         orders = orders.filter(status=status)
 
-    paginator = Paginator(orders.order_by("-created_at"), 10)
-    page_number = request.GET.get("page")
-    try:
-        orders = paginator.page(page_number)
-    except (PageNotAnInteger, EmptyPage):
-        orders = paginator.page(1)
-
+    # Évalués pendant le rendu en flux, une fois l'en-tête de la page envoyé
     context = {
-        "orders": orders,
-        "total_orders": Order.objects.count(),
-        "pending_orders": Order.objects.filter(status="pending").count(),
-        "delivered_orders": Order.objects.filter(status="delivered").count(),
+        "orders": SimpleLazyObject(lambda: CursorPaginator(orders, 10).get_page(request)),
+        "total_orders": SimpleLazyObject(lambda: estimated_count(Order.objects.all())),
+        "filtered_orders": SimpleLazyObject(lambda: estimated_count(orders)),
+        "pending_orders": SimpleLazyObject(lambda: estimated_count(Order.objects.filter(status="pending"))),
+        "delivered_orders": SimpleLazyObject(lambda: estimated_count(Order.objects.filter(status="delivered"))),
     }
-    return render(request, "admin/order_list.html", context)
+    return stream_render(request, "admin/order_list.html", context)
 
 
 @login_required
@@ -278,7 +286,7 @@ def product_update(request, pk):
                     default_variant_index = request.POST.get("default_variant")
                     if default_variant_index:
                         try:
-                            product.variants.update(is_default=False)
+                            product.variants.update(is_default=False, updated_at=timezone.now())
                             default_variant_form = variant_formset.forms[int(default_variant_index)]
                             product.default_variant = default_variant_form.instance
                             product.default_variant.is_default = True
@@ -374,26 +382,34 @@ def admin_product_list(request):
 
     products = Product.objects.select_related("category").prefetch_related("variants")
 
-    if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query)
-            | Q(description__icontains=search_query)
-            | Q(category__name__icontains=search_query)
-        )
     if category_filter:
         products = products.filter(category_id=category_filter)
     if availability_filter:
         products = products.filter(is_available=(availability_filter == "available"))
 
-    paginator = Paginator(products.order_by("-created_at"), 25)
-    page = request.GET.get("page", 1)
-    try:
-        products = paginator.page(page)
-    except (PageNotAnInteger, EmptyPage):
-        products = paginator.page(1)
+    def current_page(products=products):
+        if search_query:
+            # Résultats classés de l'index, puis produits dont la catégorie correspond
+            ranked_ids = search_product_ids(search_query)
+            category_ids = list(
+                products.filter(category__name__icontains=search_query)
+                .exclude(pk__in=ranked_ids)
+                .order_by("-created_at")
+                .values_list("pk", flat=True)[:MAX_RESULTS]
+            )
+            products = order_by_ids(products, ranked_ids + category_ids)
+        else:
+            products = products.order_by("-created_at")
 
-    return render(request, "admin/product_list.html", {
-        "products": products,
+        paginator = Paginator(products, 25)
+        try:
+            return paginator.page(request.GET.get("page", 1))
+        except (PageNotAnInteger, EmptyPage):
+            return paginator.page(1)
+
+    # Recherche et page évaluées pendant le rendu en flux, une fois l'en-tête envoyé
+    return stream_render(request, "admin/product_list.html", {
+        "products": SimpleLazyObject(current_page),
         "categories": Category.objects.all(),
         "search_query": search_query,
         "category_filter": category_filter,
@@ -451,14 +467,11 @@ def category_delete(request, pk):
 @user_passes_test(lambda u: u.is_staff)
 def post_list(request):
     """Paginated list of community posts."""
-    posts = CommunityPost.objects.select_related("author", "product").order_by("-created_at")
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    try:
-        posts = paginator.page(page_number)
-    except (PageNotAnInteger, EmptyPage):
-        posts = paginator.page(1)
-    return render(request, "admin/post_list.html", {"posts": posts})
+    posts = CommunityPost.objects.select_related("author", "product")
+    return render(request, "admin/post_list.html", {
+        "posts": CursorPaginator(posts, 10).get_page(request),
+        "posts_count": estimated_count(posts),
+    })
 
 
 from datetime import timedelta
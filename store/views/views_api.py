@@ -0,0 +1,90 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from store import api, changes
+from store.models import Product
+from store.pagination import CursorPaginator
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _visible_products(request):
+    if request.user.is_staff:
+        return Product.objects.all()
+    return Product.objects.filter(is_available=True)
+
+
+def _json_lines(lines):
+    for line in lines:
+        yield json.dumps(line, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+# -------------------- FLUX DE CHANGEMENTS --------------------
+@require_GET
+def catalog_changes(request):
+    """Catégories, produits et variantes modifiés ou supprimés depuis ``?since=<curseur>`` (JSON lines)."""
+    since = None
+    cursor = request.GET.get('since')
+    if cursor:
+        try:
+            since = changes.decode_cursor(cursor)
+        except ValueError:
+            return _json({'error': "Curseur invalide."}, status=400)
+
+    lines = changes.iter_changes(since, include_hidden=request.user.is_staff)
+    response = StreamingHttpResponse(_json_lines(lines), content_type='application/x-ndjson; charset=utf-8')
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+# -------------------- PRODUITS --------------------
+@require_GET
+def api_products(request):
+    """Produits paginés par curseur (``?cursor=``), ou lus d'un bloc avec ``?ids=1,2,3``."""
+    try:
+        serializer = api.ProductSerializer(api.parse_fields(request.GET.get('fields')))
+        ids = api.parse_ids(request.GET['ids']) if 'ids' in request.GET else None
+        limit = api.parse_limit(request.GET.get('limit'))
+    except ValueError as exc:
+        return _json({'error': str(exc)}, status=400)
+
+    products = _visible_products(request)
+    if ids is not None:
+        rows = {row['id']: row for row in serializer.rows(products.filter(pk__in=ids))}
+        return _json({
+            'results': serializer.serialize(rows[pk] for pk in ids if pk in rows),
+            'missing': [pk for pk in ids if pk not in rows],
+        })
+
+    categories = [int(pk) for pk in request.GET.getlist('category') if pk.isdigit()]
+    if categories:
+        products = products.filter(category_id__in=categories)
+    page = CursorPaginator(serializer.rows(products), limit).get_page(request, 'cursor')
+    return _json({
+        'results': serializer.serialize(page.object_list),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@require_GET
+def api_product_detail(request, pk):
+    try:
+        serializer = api.ProductSerializer(api.parse_fields(request.GET.get('fields')))
+    except ValueError as exc:
+        return _json({'error': str(exc)}, status=400)
+    row = serializer.rows(_visible_products(request).filter(pk=pk)).first()
+    if row is None:
+        return _json({'error': "Produit introuvable."}, status=404)
+    return _json(serializer.serialize([row])[0])
+
+
+# -------------------- CATÉGORIES --------------------
+@require_GET
+def api_categories(request):
+    return _json({'results': api.serialize_categories()})
@@ -1,22 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 
 from store.models import Product, CommunityPost,ProductVariant, CartItem
 from store.forms import CommunityPostForm
+from store.pagination import CursorPaginator
+from store.page_cache import anonymous_page_cache
+from store.http_cache import add_surrogate_keys, conditional_page, product_keys, reviews_state
 
+@conditional_page(reviews_state)
+@anonymous_page_cache()
 def product_reviews(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_object_or_404(Product.objects.select_related('rating_summary'), pk=pk)
     reviews = CommunityPost.objects.select_related('author').filter(
         product=product,
         is_approved=True,
         rating__isnull=False
-    ).order_by('-created_at')
+    )
 
-    paginator = Paginator(reviews, 10)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj = CursorPaginator(reviews, 10).get_page(request)
+    add_surrogate_keys(request, f'reviews-{product.id}', product_keys([product]))
 
     return render(request, 'store/product_reviews.html', {
         'product': product,
@@ -1,20 +1,53 @@
+from urllib.parse import urlsplit
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt
 
+from ..cart_pricing import price_cart
+from ..cookie_cart import CookieCart
 from ..models import Product, ProductVariant, CartItem
-from ..utils import get_or_create_cart
+from ..utils import get_cart, get_or_create_cart, remember_cart_count, save_cookie_cart
 
 
 # -------------------- CART VIEWS --------------------
 def view_cart(request):
     """Afficher le contenu du panier."""
-    cart = get_or_create_cart(request)
-    return render(request, 'store/cart.html', {'cart': cart})
-
-
+    cart = get_cart(request)
+    pricing = price_cart(cart)
+    response = render(request, 'store/cart.html', {'pricing': pricing})
+    pricing.acknowledge()
+    return save_cookie_cart(request, cart, response)
+
+
+def _is_same_origin(request):
+    """Vrai si le POST part d'une page du site, d'après les en-têtes posés par le navigateur."""
+    site = request.headers.get('Sec-Fetch-Site')
+    if site is not None:
+        return site in ('same-origin', 'none')
+    source = request.headers.get('Origin') or request.headers.get('Referer')
+    if not source:
+        return False
+    parts = urlsplit(source)
+    origin = f'{parts.scheme}://{parts.netloc}'
+    return origin == f'{request.scheme}://{request.get_host()}' or origin in settings.CSRF_TRUSTED_ORIGINS
+
+
+# Les cartes produit et la fiche sont partagées par tous les visiteurs (caches
+# de pages et proxy) : leurs formulaires n'ont pas de jeton CSRF, l'origine de
+# la requête est vérifiée à la place.
+@csrf_exempt
 def add_to_cart(request, product_id):
     """Ajouter un produit (et variante) au panier."""
     product = get_object_or_404(Product, id=product_id)
+    # Anciens liens et robots : aucun panier ni session créés sur un GET
+    if request.method != 'POST':
+        return redirect('product_detail', pk=product.id)
+    if not _is_same_origin(request):
+        raise PermissionDenied("Requête d'une autre origine.")
     variants = ProductVariant.objects.filter(product=product).only('id','name','price','product_id')
 
     # Récupérer la variante
@@ -34,41 +67,56 @@ def add_to_cart(request, product_id):
     except (TypeError, ValueError):
         quantity = 1
 
+    # Visiteur anonyme : le panier reste dans son cookie, rien n'est écrit en base
+    if not request.user.is_authenticated:
+        cart = CookieCart.for_request(request)
+        if not cart.add(variant, quantity):
+            messages.error(request, "Votre panier est plein.")
+            return redirect('view_cart')
+        messages.success(request, f"'{product.name}' ({variant.name}) ajouté au panier.")
+        response = remember_cart_count(request, redirect('product_list'), cart.count())
+        return cart.save(response)
+
     # Créer ou mettre à jour le CartItem
     cart = get_or_create_cart(request)
     cart_item, created = CartItem.objects.get_or_create(
         cart=cart,
         variant=variant,
-        defaults={'quantity': quantity}
+        defaults={'quantity': quantity, 'unit_price': variant.price}
     )
     if not created:
         cart_item.quantity += quantity
+        cart_item.unit_price = variant.price
         cart_item.save()
 
     messages.success(request, f"'{product.name}' ({variant.name}) ajouté au panier.")
-    return redirect('product_list')
+    return remember_cart_count(request, redirect('product_list'), cart.items.count())
 
 
 def remove_from_cart(request, item_id):
-    """Supprimer un article du panier."""
-    cart = get_or_create_cart(request)
+    """Supprimer un article du panier (``item_id`` : la variante pour un panier cookie)."""
+    cart = get_cart(request)
+    if isinstance(cart, CookieCart):
+        if not cart.remove(item_id):
+            raise Http404("Article absent du panier.")
+        messages.success(request, "Produit retiré du panier.")
+        return cart.save(remember_cart_count(request, redirect('view_cart'), cart.count()))
+
     item = get_object_or_404(CartItem, id=item_id, cart=cart)
     item.delete()
     messages.success(request, "Produit retiré du panier.")
-    return redirect('view_cart')
+    return remember_cart_count(request, redirect('view_cart'), cart.items.count())
 
 
 def cart_summary(request):
     """Résumé et validation du panier."""
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
+    pricing = price_cart(cart)
 
-    if not cart.items.exists():
+    if not pricing:
         messages.warning(request, "Votre panier est vide.")
-        return redirect('view_cart')
-
-    total = sum(item.variant.price * item.quantity for item in cart.items.all())
+        return save_cookie_cart(request, cart, redirect('view_cart'))
 
-    return render(request, 'store/cart_summary.html', {
-        'cart': cart,
-        'total': total,
-    })
+    response = render(request, 'store/cart_summary.html', {'pricing': pricing})
+    pricing.acknowledge()
+    return save_cookie_cart(request, cart, response)